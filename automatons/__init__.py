@@ -1,3 +1,4 @@
 from .enfa import EpsilonNFA
 from .nfa import NFA
 from .dfa import DFA
+from .parikh import SemilinearSet
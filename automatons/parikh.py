@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import math
+import typing
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from utils import Multiset, closing_index
+
+Vector = Tuple[int, ...]
+Element = Tuple[str, typing.Any]
+
+
+class LinearSet:
+    """
+    Set of vectors base + c_1 * p_1 + ... + c_k * p_k with c_i >= 0.
+    Unit periods are kept apart as free coordinates, so a linear set without other periods is a box.
+    """
+
+    def __init__(self, base: Vector, periods: Iterable[Vector]) -> None:
+        self.base: Vector = base
+        self.periods: FrozenSet[Vector] = frozenset(p for p in periods if any(p))
+        self.free: FrozenSet[int] = frozenset(p.index(1) for p in self.periods if sum(p) == 1)
+        self.rest: Tuple[Vector, ...] = tuple(sorted(p for p in self.periods if sum(p) != 1 and
+                                                     any(c and i not in self.free for i, c in enumerate(p))))
+        self.box: bool = len(self.rest) == 0
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LinearSet) and self.base == other.base and self.periods == other.periods
+
+    def __hash__(self) -> int:
+        return hash((self.base, self.periods))
+
+    def __repr__(self) -> str:
+        return f'LinearSet({self.base}, {sorted(self.periods)})'
+
+    def contains(self, vector: Vector) -> bool:
+        diff = [v - b for v, b in zip(vector, self.base)]
+        if min(diff, default=0) < 0:
+            return False
+        return _generated(diff, self.rest, self.free)
+
+
+def _generated(diff: List[int], periods: Tuple[Vector, ...], free: FrozenSet[int]) -> bool:
+    fixed = [i for i, c in enumerate(diff) if c and i not in free]
+    if not fixed:
+        return True
+    i = min(fixed, key=lambda j: sum(1 for p in periods if p[j]))
+    covering = [p for p in periods if p[i]]
+    if not covering:
+        return False
+    period = covering[0]
+    others = tuple(p for p in periods if p is not period)
+    if len(covering) == 1:
+        if diff[i] % period[i]:
+            return False
+        candidates = [diff[i] // period[i]]
+    else:
+        candidates = range(min(d // p for d, p in zip(diff, period) if p), -1, -1)
+    for c in candidates:
+        remaining = [d - c * p for d, p in zip(diff, period)]
+        if min(remaining) >= 0 and _generated(remaining, others, free):
+            return True
+    return False
+
+
+class SemilinearSet:
+    """
+    Parikh image of a regular expression: the multisets accepted by DFA.accepts_multiset,
+    evaluated on symbol counts instead of searching over spike orderings.
+    """
+
+    def __init__(self, alphabet: Tuple[str, ...], linear_sets: Iterable[LinearSet], universal: bool = False) -> None:
+        self.alphabet: Tuple[str, ...] = alphabet
+        self.index: Dict[str, int] = {s: i for i, s in enumerate(alphabet)}
+        self.linear_sets: List[LinearSet] = _simplify(linear_sets)
+        self.universal: bool = universal
+        self.box: bool = universal or all(ls.box for ls in self.linear_sets)
+
+    def __repr__(self) -> str:
+        if self.universal:
+            return 'SemilinearSet(*)'
+        return f'SemilinearSet({self.alphabet}, {self.linear_sets})'
+
+    @staticmethod
+    def universe() -> SemilinearSet:
+        return SemilinearSet((), [], universal=True)
+
+    @staticmethod
+    def singleton(multiset: Multiset[str]) -> SemilinearSet:
+        alphabet = tuple(sorted(s for s, c in multiset.map.items() if c > 0))
+        return SemilinearSet(alphabet, [LinearSet(tuple(multiset.count(s) for s in alphabet), ())])
+
+    @staticmethod
+    def from_RegEx(regex: typing.Union[str, List[str]]) -> SemilinearSet:
+        tree = _parse(regex)
+        alphabet = tuple(sorted(_symbols(tree)))
+        builder = _Builder(alphabet)
+        language, _ = builder.sequence(tree)
+        return SemilinearSet(alphabet, language)
+
+    def _vector(self, counts: Mapping[str, int]) -> Optional[Vector]:
+        for symbol, count in counts.items():
+            if count > 0 and symbol not in self.index:
+                return None
+        return tuple(counts.get(s, 0) for s in self.alphabet)
+
+    def contains(self, counts: Mapping[str, int]) -> bool:
+        if self.universal:
+            return True
+        vector = self._vector(counts)
+        if vector is None:
+            return False
+        return any(ls.contains(vector) for ls in self.linear_sets)
+
+    def accepts_multiset(self, multiset: Multiset[str]) -> bool:
+        return self.contains(multiset.map)
+
+    def _boxes(self) -> List[Tuple[Dict[str, int], FrozenSet[str], bool]]:
+        """
+        Boxes covering the linear sets: base count of each symbol, symbols without upper bound and whether the
+        symbols outside the alphabet are unbounded too (only in the universe)
+        """
+        if self.universal:
+            return [({}, frozenset(), True)]
+        return [(dict(zip(self.alphabet, ls.base)),
+                 frozenset(s for i, s in enumerate(self.alphabet) if i in ls.free or any(p[i] for p in ls.rest)), False)
+                for ls in self.linear_sets]
+
+    def may_intersect(self, other: SemilinearSet, lower: Optional[Mapping[str, int]] = None) -> bool:
+        """
+        False only if no multiset with at least lower[s] symbols s belongs to both sets. The check is done on boxes
+        covering the linear sets, so a True answer does not prove that such a multiset exists.
+        """
+        lower = lower or {}
+        for a in self._boxes():
+            for b in other._boxes():
+                if all(_meet(s, a, b, lower.get(s, 0)) for s in set(a[0]) | set(b[0]) | set(lower)):
+                    return True
+        return False
+
+    def line(self, counts: Mapping[str, int], direction: Mapping[str, int], lower: Mapping[str, int]) -> \
+            Optional[List[Tuple[int, float]]]:
+        """
+        Intervals [first, last] of the m >= 0 such that counts + m * direction is in the set and has at least lower[s]
+        symbols s, last being math.inf if unbounded. None if the set is not made of boxes.
+        """
+        if not self.box:
+            return None
+        symbols = set(counts) | set(direction) | set(lower) | set(self.alphabet)
+        boxes = [({}, frozenset(), True)] if self.universal else \
+            [(dict(zip(self.alphabet, ls.base)), frozenset(self.alphabet[i] for i in ls.free), False)
+             for ls in self.linear_sets]
+        res = []
+        for base, free, unbounded in boxes:
+            first, last = 0, math.inf
+            for s in symbols:
+                x, d, least = counts.get(s, 0), direction.get(s, 0), lower.get(s, 0)
+                if s in free or s not in base and unbounded:
+                    first, last = _at_least(x, d, max(least, base.get(s, 0)), first, last)
+                else:
+                    first, last = _at_least(x, d, least, first, last)
+                    first, last = _equal(x, d, base.get(s, 0), first, last)
+                if first > last:
+                    break
+            if first <= last:
+                res.append((first, last))
+        return res
+
+    def run_length(self, counts: Mapping[str, int], removed: Mapping[str, int], limit: int) -> int:
+        """
+        First j in [0, limit) such that counts - j * removed is not in the set, or limit if there is none
+        """
+        if self.universal or limit <= 0:
+            return max(limit, 0)
+        if not self.box:
+            j = 0
+            symbols = set(counts) | set(removed)
+            while j < limit and self.contains({s: counts.get(s, 0) - j * removed.get(s, 0) for s in symbols}):
+                j += 1
+            return j
+
+        foreign = [(counts.get(s, 0), removed.get(s, 0)) for s in set(counts) | set(removed) if s not in self.index]
+        intervals = []
+        for ls in self.linear_sets:
+            lo, hi = 0, limit - 1
+            coordinates = [(counts.get(s, 0), removed.get(s, 0), ls.base[i], i in ls.free)
+                           for i, s in enumerate(self.alphabet)]
+            coordinates += [(x, r, 0, False) for x, r in foreign]
+            for x, r, b, free in coordinates:
+                if free:
+                    if r:
+                        hi = min(hi, (x - b) // r)
+                    elif x < b:
+                        hi = -1
+                elif r:
+                    if x < b or (x - b) % r:
+                        hi = -1
+                    else:
+                        lo, hi = max(lo, (x - b) // r), min(hi, (x - b) // r)
+                elif x != b:
+                    hi = -1
+                if lo > hi:
+                    break
+            if lo <= hi:
+                intervals.append((lo, hi))
+
+        first = 0
+        for lo, hi in sorted(intervals):
+            if lo > first:
+                break
+            first = max(first, hi + 1)
+        return min(first, limit)
+
+
+def _at_least(x: int, d: int, least: int, first: float, last: float) -> Tuple[float, float]:
+    # m such that x + m * d >= least
+    if d == 0:
+        return (first, last) if x >= least else (1, 0)
+    if d > 0:
+        return max(first, -((x - least) // d)), last
+    return first, min(last, (x - least) // -d)
+
+
+def _equal(x: int, d: int, value: int, first: float, last: float) -> Tuple[float, float]:
+    # m such that x + m * d == value
+    if d == 0:
+        return (first, last) if x == value else (1, 0)
+    if (value - x) % d:
+        return 1, 0
+    m = (value - x) // d
+    return max(first, m), min(last, m)
+
+
+def _meet(symbol: str, a: Tuple[Dict[str, int], FrozenSet[str], bool], b: Tuple[Dict[str, int], FrozenSet[str], bool],
+          lower: int) -> bool:
+    exact = set()
+    for base, free, unbounded in (a, b):
+        lower = max(lower, base.get(symbol, 0))
+        if symbol not in free and (symbol in base or not unbounded):
+            exact.add(base.get(symbol, 0))
+    return len(exact) == 0 or len(exact) == 1 and exact.pop() >= lower
+
+
+def _parse(regex: typing.Union[str, List[str]]) -> List[Element]:
+    # Mirrors the grammar of EpsilonNFA._from_RegEx
+    res = []
+    while len(regex):
+        if len(regex) == 1:
+            res.append(('sym', regex[0]))
+            break
+        if regex[0] == '(':
+            i = closing_index(regex)
+            inner = _parse(regex[1:i])
+            suffix = regex[i + 1] if i + 1 < len(regex) else None
+            if suffix == '*':
+                res.append(('group*', inner))
+                regex = regex[i + 2:]
+            elif suffix == '+':
+                res.append(('group+', inner))
+                regex = regex[i + 2:]
+            else:
+                res.append(('group', inner))
+                regex = regex[i + 1:]
+        elif regex[1] == '*':
+            res.append(('sym*', regex[0]))
+            regex = regex[2:]
+        elif regex[1] == '+':
+            res.append(('sym+', regex[0]))
+            regex = regex[2:]
+        else:
+            res.append(('sym', regex[0]))
+            regex = regex[1:]
+    return res
+
+
+def _symbols(tree: List[Element]) -> set:
+    res = set()
+    for kind, value in tree:
+        if kind.startswith('group'):
+            res |= _symbols(value)
+        else:
+            res.add(value)
+    return res
+
+
+def _add(a: Vector, b: Vector) -> Vector:
+    return tuple(x + y for x, y in zip(a, b))
+
+
+def _concat(left: List[LinearSet], right: List[LinearSet]) -> List[LinearSet]:
+    return _simplify(LinearSet(_add(a.base, b.base), a.periods | b.periods) for a in left for b in right)
+
+
+def _star(language: List[LinearSet], zero: Vector) -> List[LinearSet]:
+    res = [LinearSet(zero, ())]
+    for ls in language:
+        if any(ls.base):
+            res = _concat(res, [LinearSet(zero, ()), LinearSet(ls.base, ls.periods | {ls.base})])
+        else:
+            res = _concat(res, [LinearSet(zero, ls.periods)])
+    return res
+
+
+def _simplify(linear_sets: Iterable[LinearSet]) -> List[LinearSet]:
+    unique = list(dict.fromkeys(linear_sets))
+    res = []
+    for i, ls in enumerate(unique):
+        if not any(j != i and _includes(other, ls) and (not _includes(ls, other) or j < i)
+                   for j, other in enumerate(unique)):
+            res.append(ls)
+    return res
+
+
+def _includes(a: LinearSet, b: LinearSet) -> bool:
+    return a.contains(b.base) and all(_generated(list(p), a.rest, a.free) for p in b.periods)
+
+
+class _Builder:
+    """
+    Computes the Parikh image of each regex element following the construction in EpsilonNFA._from_RegEx.
+    Besides the language, it tracks the words that loop back to the initial state, since the starred
+    groups of that construction also accept them.
+    """
+
+    def __init__(self, alphabet: Tuple[str, ...]) -> None:
+        self.index = {s: i for i, s in enumerate(alphabet)}
+        self.zero: Vector = tuple(0 for _ in alphabet)
+        self.empty: List[LinearSet] = [LinearSet(self.zero, ())]
+
+    def unit(self, symbol: str) -> Vector:
+        return tuple(int(i == self.index[symbol]) for i in range(len(self.zero)))
+
+    def sequence(self, tree: List[Element]) -> Tuple[List[LinearSet], List[LinearSet]]:
+        if not tree:
+            return self.empty, self.empty
+        language, loop = self.element(tree[0])
+        for element in tree[1:]:
+            language = _concat(language, self.element(element)[0])
+        return language, loop
+
+    def element(self, element: Element) -> Tuple[List[LinearSet], List[LinearSet]]:
+        kind, value = element
+        if kind == 'sym':
+            return [LinearSet(self.unit(value), ())], self.empty
+        if kind == 'sym*':
+            closure = [LinearSet(self.zero, (self.unit(value),))]
+            return closure, closure
+        if kind == 'sym+':
+            return [LinearSet(self.unit(value), (self.unit(value),))], self.empty
+
+        language, loop = self.sequence(value)
+        if kind == 'group':
+            return language, loop
+        closure = _star(language + loop, self.zero)
+        if kind == 'group*':
+            return closure, closure
+        return _concat(closure, language), closure
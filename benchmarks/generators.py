@@ -0,0 +1,98 @@
+from utils import Multiset
+from simulator.snpsystem import SNPSystem
+
+
+def chain(size: int) -> SNPSystem:
+    """
+    Neurons 0 -> 1 -> ... -> size - 1 -> out, each passes all its spikes to the next one
+    """
+    model = SNPSystem()
+    model.set_input(0)
+    model.set_output('out')
+    for i in range(size):
+        model.add_channel(0, i, i + 1 if i + 1 < size else 'out')
+        model.add_rule(i, ['a', '+'], Multiset(['a']), {0: Multiset(['a'])})
+    return model
+
+
+def ring(size: int, tokens: int = 1) -> SNPSystem:
+    """
+    Ring of neurons where tokens spikes circulate forever, the last neuron also reports to the output
+    """
+    model = SNPSystem()
+    model.set_output('out')
+    for i in range(size):
+        model.add_channel(0, i, (i + 1) % size)
+        channels = {0: Multiset(['a']), 1: Multiset(['b'])} if i == size - 1 else {0: Multiset(['a'])}
+        model.add_rule(i, ['a', '+'], Multiset(['a']), channels)
+    model.add_channel(1, size - 1, 'out')
+    for i in range(tokens):
+        model.add_symbols(i * size // tokens, 'a')
+    return model
+
+
+def fanout(width: int, depth: int) -> SNPSystem:
+    """
+    Layers of width neurons, every neuron of a layer connected to every neuron of the next one and the last
+    layer connected back to the first. Each neuron discards all but one of the spikes it receives, through a
+    channel without synapses (forgetting rules ignore their regular expression), and fires the remaining one.
+    """
+    model = SNPSystem()
+    model.set_output('out')
+    for layer in range(depth):
+        for i in range(width):
+            neuron = layer * width + i
+            for j in range(width):
+                model.add_channel(0, neuron, (layer + 1) % depth * width + j)
+            model.add_rule(neuron, ['a', 'a', '+'], Multiset(['a']), {1: Multiset()})
+            model.add_rule(neuron, None, Multiset(['a']), {0: Multiset(['a'])})
+    model.add_channel(0, depth * width - 1, 'out')
+    model.add_symbols(0, 'a')
+    return model
+
+
+def register_modules(modules: int, value: int) -> SNPSystem:
+    """
+    Chain of register machine transfer modules: the control spike 'a' of each module moves the value of its
+    register ('1' spikes) into the register of the next module and then passes control on.
+    """
+    model = SNPSystem()
+    model.set_input(0)
+    model.set_output('out')
+    model.add_content(0, Multiset.from_counts({'1': value}))
+    for i in range(modules):
+        target = i + 1 if i + 1 < modules else 'out'
+        model.add_channel(0, i, target)
+        model.add_rule(i, ['1', '*', 'a'], Multiset(['1']), {0: Multiset(['1'])})
+        model.add_rule(i, None, Multiset(['a']), {0: Multiset(['a'])})
+    return model
+
+
+def large_spikes(size: int) -> SNPSystem:
+    """
+    Ring of neurons passing on the huge amount of spikes of its input, of two kinds so the regular expressions
+    are not trivial
+    """
+    model = SNPSystem()
+    model.set_input(0)
+    model.set_output('out')
+    for i in range(size):
+        model.add_channel(0, i, (i + 1) % size)
+        model.add_rule(i, ['a', '+', 'b', '*'], Multiset(['a']), {0: Multiset(['a'])})
+        model.add_rule(i, ['b', '+'], Multiset(['b']), {0: Multiset(['b'])})
+    model.add_channel(0, size - 1, 'out')
+    return model
+
+
+def many_rules(size: int, rules: int) -> SNPSystem:
+    """
+    Ring of neurons with rules neurons each, the content of a neuron cycles through all of them
+    """
+    model = SNPSystem()
+    model.set_output('out')
+    for i in range(size):
+        model.add_channel(0, i, (i + 1) % size)
+        for k in range(1, rules + 1):
+            model.add_rule(i, None, Multiset(['a'] * k), {0: Multiset(['a'] * (k % rules + 1))})
+    model.add_symbols(0, 'a')
+    return model
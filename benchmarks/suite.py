@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+from benchmarks import generators
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+
+@dataclass
+class Benchmark:
+    name: str
+    build: Callable[[int], SNPSystem]
+    input_data: Callable[[int], Multiset[str]] = lambda scale: Multiset()
+    max_steps: Optional[int] = None
+    mode: str = 'halt'
+
+
+@dataclass
+class Result:
+    seconds: float
+    steps: int
+    spikes: int
+    peak_memory: int
+    steps_per_second: float = field(init=False)
+    spikes_per_second: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.steps_per_second = self.steps / self.seconds if self.seconds else 0.
+        self.spikes_per_second = self.spikes / self.seconds if self.seconds else 0.
+
+
+BENCHMARKS: List[Benchmark] = [
+    Benchmark('chain', lambda scale: generators.chain(500 * scale), lambda scale: Multiset(['a'] * 10)),
+    Benchmark('ring', lambda scale: generators.ring(100 * scale, 10), max_steps=2000),
+    Benchmark('fanout', lambda scale: generators.fanout(20 * scale, 5), max_steps=200),
+    Benchmark('register-modules', lambda scale: generators.register_modules(200 * scale, 1000 * scale),
+              lambda scale: Multiset(['a'])),
+    Benchmark('large-spikes', lambda scale: generators.large_spikes(50),
+              lambda scale: Multiset.from_counts({'a': 10 ** 6 * scale, 'b': 10 ** 5}), max_steps=2000),
+    Benchmark('many-rules', lambda scale: generators.many_rules(20, 50 * scale), max_steps=2000),
+]
+
+
+def measure(benchmark: Benchmark, scale: int = 1, repeat: int = 3, seed: int = 0) -> Result:
+    """
+    Best wall time of repeat runs, then one more run of the same computation counting the steps and
+    the delivered spikes while tracing the memory
+    """
+    model = benchmark.build(scale)
+    input_data = benchmark.input_data(scale)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.run(input_data, mode=benchmark.mode, max_steps=benchmark.max_steps, seed=seed)
+        best = min(best, time.perf_counter() - start)
+
+    counters = {'steps': 0, 'spikes': 0}
+    step, run_rule = model._step, model._run_rule
+
+    def counted_step():
+        counters['steps'] += 1
+        return step()
+
+    def counted_run_rule(neuron, rule, times=1):
+        counters['spikes'] += times * sum(sum(sent.map.values()) for _, sent in rule.targets)
+        return run_rule(neuron, rule, times)
+
+    model._step, model._run_rule = counted_step, counted_run_rule
+    tracemalloc.start()
+    try:
+        model.run(input_data, mode=benchmark.mode, max_steps=benchmark.max_steps, seed=seed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        del model._step, model._run_rule
+    return Result(best, counters['steps'], counters['spikes'], peak)
+
+
+def compare(results: Dict[str, Result], baselines: Dict[str, dict], threshold: float) -> List[str]:
+    """
+    Benchmarks whose steps per second dropped more than threshold (a fraction) below their baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baselines and result.steps_per_second < baselines[name]['steps_per_second'] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times SNPSystem.run on generated SNP systems')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    parser.add_argument('--scale', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='local file of baselines to compare with')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--threshold', type=float, default=0.1, help='tolerated slowdown, 0.1 by default')
+    args = parser.parse_args(argv)
+
+    selected = [b for b in BENCHMARKS if not args.names or b.name in args.names]
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f).get(str(args.scale), {})
+
+    results = {}
+    print(f'{"benchmark":<18}{"seconds":>10}{"steps":>10}{"steps/s":>12}{"spikes/s":>14}{"peak KiB":>10}{"baseline":>10}')
+    for benchmark in selected:
+        result = results[benchmark.name] = measure(benchmark, args.scale, args.repeat)
+        baseline = baselines.get(benchmark.name)
+        change = f'{result.steps_per_second / baseline["steps_per_second"] - 1:+.1%}' if baseline else '-'
+        print(f'{benchmark.name:<18}{result.seconds:>10.4f}{result.steps:>10}{result.steps_per_second:>12.1f}'
+              f'{result.spikes_per_second:>14.1f}{result.peak_memory / 1024:>10.0f}{change:>10}')
+
+    if args.save:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f)
+        stored.setdefault(str(args.scale), {}).update({name: asdict(result) for name, result in results.items()})
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=2)
+
+    regressions = compare(results, baselines, args.threshold)
+    if regressions:
+        print(f'Regressions over {args.threshold:.0%}: {", ".join(regressions)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
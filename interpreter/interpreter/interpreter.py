@@ -39,7 +39,7 @@ class Interpreter(Visitor[Data]):
         self.model.set_output('out')
         self.main.accept(self)
         for membrane, content in self.mm._membranes.items():
-            self.model.add_symbols(membrane, *list(content))
+            self.model.add_content(membrane, content)
         return self.model
 
     def calc(self, left: Data, op: TokenType, right: Data) -> Data:
@@ -1,4 +1,6 @@
-from typing import IO, List
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import IO, List, Optional
 import re
 
 from interpreter.interpreter import Interpreter
@@ -6,7 +8,79 @@ from interpreter.parser import Parser
 from interpreter.scanner import Scanner
 import click
 
-from utils import Multiset
+from simulator import __version__
+from simulator.checkpoint import Checkpoint, Checkpointer
+from simulator.explorer import Explorer
+from simulator.matrixengine import MatrixEngine
+from simulator.parallel import run_repeated
+from simulator.partition import PartitionedEngine
+from simulator.profiler import Profiler, phase
+from simulator.snpsystem import Periodic, SNPSystem
+from simulator.results import ResultCache
+from simulator.statistics import OutcomeHistogram, aggregate_repeated
+from simulator.trace import TraceWriter
+from utils import DiskCache, Multiset
+
+
+def parse_input(inp: str, separator: str, no_strip: bool) -> Multiset[str]:
+    """
+    Symbols separated by separator, symbol:count stands for count copies of symbol
+    """
+    symbols = [] if inp is None else inp.split(separator)
+    if not no_strip:
+        symbols = list(map(lambda x: x.strip(), symbols))
+    counts = defaultdict(int)
+    for symbol in symbols:
+        if m := re.fullmatch(r'(.+):(\d+)', symbol):
+            counts[m.group(1)] += int(m.group(2))
+        else:
+            counts[symbol] += 1
+    return Multiset.from_counts(counts)
+
+
+def load_model(src: str, cache: Optional[DiskCache]) -> SNPSystem:
+    """
+    Compiles the source, or loads the model compiled by a previous run of the same source and version
+    """
+    key = DiskCache.key(__version__, src) if cache is not None else None
+    if cache is not None:
+        with phase('cache'):
+            model = cache.get(key)
+        if model is not None:
+            return model
+
+    with phase('scanning'):
+        tokens = Scanner(src).scan()
+    with phase('parsing'):
+        parsed = Parser(tokens).parse()
+    with phase('interpretation'):
+        model = Interpreter(parsed).run()
+    if cache is not None:
+        with phase('cache'):
+            model.finalize()
+            cache[key] = model
+    return model
+
+
+def format_result(res, mode: str) -> str:
+    if isinstance(res, Periodic):
+        return str(res)
+    elif mode == 'time-mc':
+        return str([dict(r) for r in res])
+    elif mode == 'halt-mc':
+        return str(dict(res))
+    else:
+        return str(res)
+
+
+def print_result(res, mode: str) -> None:
+    print(format_result(res, mode))
+
+
+def print_outcomes(histogram: OutcomeHistogram, mode: str) -> None:
+    for res, count, frequency, (low, high) in histogram.outcomes():
+        print(f'{count} {frequency:.6f} [{low:.6f}, {high:.6f}] {format_result(res, mode)}')
+    click.echo(histogram, err=True)
 
 
 @click.command()
@@ -16,31 +90,134 @@ from utils import Multiset
 @click.option('--no-strip', 'no_strip', is_flag=True)
 @click.option('--render', is_flag=True)
 @click.option('--render-path', 'render_path', default='./tmp', type=str)
+@click.option('--render-every', 'render_every', default=1, type=int)
+@click.option('--render-range', 'render_range', default=None, type=str)
+@click.option('--render-workers', 'render_workers', default=None, type=int)
 @click.option('--repeat', '-r', default=1, type=int)
-@click.option('--mode', '-m', default='halt', type=click.Choice(['halt', 'halt-mc', 'time', 'time-mc']))
+@click.option('--aggregate', is_flag=True)
+@click.option('--mode', '-m', default='halt', type=click.Choice(['halt', 'halt-mc', 'time', 'time-mc', 'explore', 'explore-mc']))
 @click.option('--max-steps', 'max_steps', default=None, type=int)
-def main(src: IO, inp: str, separator: str, no_strip: bool, render: bool, render_path: str, repeat: int, mode: str, max_steps: int):
-    if inp is None:
-        inp = []
-    else:
-        inp = inp.split(separator)
-
-    if not no_strip:
-        inp = list(map(lambda x: x.strip(), inp))
+@click.option('--engine', '-e', default='python', type=click.Choice(['python', 'matrix', 'partitioned']))
+@click.option('--partitions', default=2, type=click.IntRange(min=1))
+@click.option('--jobs', '-j', default=1, type=int)
+@click.option('--seed', default=None, type=int)
+@click.option('--max-states', 'max_states', default=None, type=int)
+@click.option('--detect-cycles', 'detect_cycles', is_flag=True)
+@click.option('--fast-forward', 'fast_forward', is_flag=True)
+@click.option('--checkpoint', 'checkpoint_path', default=None, type=str)
+@click.option('--checkpoint-every', 'checkpoint_every', default=None, type=int)
+@click.option('--checkpoint-seconds', 'checkpoint_seconds', default=None, type=float)
+@click.option('--resume', 'resume_path', default=None, type=click.Path(exists=True, dir_okay=False))
+@click.option('--profile', 'profile_path', default=None, type=str)
+@click.option('--batch', 'batch', default=None, type=click.File('r'))
+@click.option('--cache-dir', 'cache_dir', default=None, type=click.Path(file_okay=False))
+@click.option('--trace', 'trace_path', default=None, type=str)
+@click.option('--result-cache', 'result_cache', default=None, type=click.Path(file_okay=False))
+@click.option('--result-cache-size', 'result_cache_size', default=1024, type=int)
+def main(src: IO, inp: str, separator: str, no_strip: bool, render: bool, render_path: str, render_every: int,
+         render_range: str, render_workers: int, repeat: int, aggregate: bool, mode: str, max_steps: int, engine: str,
+         partitions: int, jobs: int, seed: int, max_states: int, detect_cycles: bool, fast_forward: bool,
+         checkpoint_path: str, checkpoint_every: int, checkpoint_seconds: float, resume_path: str, profile_path: str,
+         batch: IO, cache_dir: str, trace_path: str, result_cache: str, result_cache_size: int):
+    if render and engine != 'python':
+        raise click.UsageError(f'The {engine} engine can not render the computation steps')
+    if render and jobs > 1:
+        raise click.UsageError('The computation steps can only be rendered with a single job')
+    if detect_cycles and engine != 'python':
+        raise click.UsageError(f'The {engine} engine can not detect cycles')
+    if fast_forward and engine != 'python':
+        raise click.UsageError(f'The {engine} engine can not fast-forward periodic regimes')
+    if fast_forward and render:
+        raise click.UsageError('The steps of a fast-forwarded run can not be rendered')
+    if (checkpoint_path or resume_path) and engine != 'python':
+        raise click.UsageError(f'The {engine} engine can not save or resume checkpoints')
+    if engine == 'partitioned' and jobs > 1:
+        raise click.UsageError('The partitioned engine runs one computation at a time, its processes are set with '
+                               '--partitions')
+    if checkpoint_path and (repeat > 1 or jobs > 1):
+        raise click.UsageError('Checkpoints can only be saved from a single run')
+    if checkpoint_path and checkpoint_every is None and checkpoint_seconds is None:
+        raise click.UsageError('--checkpoint needs --checkpoint-every or --checkpoint-seconds')
+    if profile_path and jobs > 1:
+        raise click.UsageError('Runs can only be profiled with a single job')
+    if batch is not None and (inp is not None or repeat > 1 or jobs > 1 or render or checkpoint_path or resume_path
+                              or mode.startswith('explore')):
+        raise click.UsageError('--batch can not be combined with --input, --repeat, --jobs, --render, checkpoints '
+                               'or the explore modes')
+    if trace_path and (engine != 'python' or repeat > 1 or jobs > 1 or batch is not None or fast_forward
+                       or mode.startswith('explore')):
+        raise click.UsageError('--trace records a single run of the python engine, it can not be combined with '
+                               '--repeat, --jobs, --batch, --fast-forward or the explore modes')
+    if result_cache and engine != 'python':
+        raise click.UsageError(f'The results of the {engine} engine can not be cached')
+    if aggregate and (batch is not None or mode.startswith('explore')):
+        raise click.UsageError('--aggregate can not be combined with --batch or the explore modes')
+    if mode.startswith('explore') and (engine != 'python' or jobs > 1 or seed is not None or detect_cycles or repeat > 1
+                                       or render or fast_forward or checkpoint_path or resume_path or result_cache):
+        raise click.UsageError('The explore modes run every computation once on the python engine, they can not be '
+                               'combined with --engine, --jobs, --seed, --detect-cycles, --repeat, --render, '
+                               '--fast-forward, checkpoints or --result-cache')
+    if render_range is not None:
+        if not re.fullmatch(r'\d+:\d+', render_range):
+            raise click.BadParameter('The range must be written as first:last', param_hint='--render-range')
+        render_range = tuple(map(int, render_range.split(':')))
 
+    inp = parse_input(inp, separator, no_strip)
+    inputs = [parse_input(line.rstrip('\n'), separator, no_strip) for line in batch if line.strip()] if batch else None
     src = src.read()
 
-    tokens = Scanner(src).scan()
-    parsed = Parser(tokens).parse()
-    model = Interpreter(parsed).run()
-    for _ in range(repeat):
-        res = model.run(Multiset(inp), render_steps=render, render_path=render_path, mode=mode, max_steps=max_steps)
-        if mode == 'time-mc':
-            print([dict(r) for r in res])
-        elif mode == 'halt-mc':
-            print(dict(res))
+    profiler = Profiler() if profile_path else None
+    with profiler if profiler is not None else nullcontext():
+        model = load_model(src, DiskCache(cache_dir) if cache_dir else None)
+
+        if mode.startswith('explore'):
+            explorer = Explorer(model, mode.replace('explore', 'halt'), max_depth=max_steps, max_states=max_states)
+            with phase('exploration'):
+                outputs = explorer.explore(inp)
+            for res in outputs:
+                print(dict(res) if mode == 'explore-mc' else res)
+            click.echo(explorer.stats, err=True)
         else:
-            print(res)
+            checkpointer = Checkpointer(checkpoint_path, checkpoint_every, checkpoint_seconds) if checkpoint_path else None
+            resume = Checkpoint.load(resume_path) if resume_path else None
+            repeated = aggregate_repeated if aggregate else run_repeated
+            trace = TraceWriter(trace_path) if trace_path else None
+            # Workers draw random seeds for unseeded runs, their results could never be found again
+            results = ResultCache(result_cache, result_cache_size << 20) \
+                if result_cache and (seed is not None or model.deterministic()) else None
+            if engine == 'matrix':
+                with phase('compilation'):
+                    runner = MatrixEngine(model)
+                if inputs is not None:
+                    runs = runner.run_batch(inputs, mode=mode, max_steps=max_steps, seed=seed)
+                else:
+                    runs = repeated(runner, inp, repeat, jobs, seed, mode=mode, max_steps=max_steps)
+            elif engine == 'partitioned':
+                with phase('compilation'):
+                    runner = PartitionedEngine(model, partitions)
+                with runner:
+                    if inputs is not None:
+                        runs = runner.run_batch(inputs, mode=mode, max_steps=max_steps, seed=seed)
+                    else:
+                        runs = repeated(runner, inp, repeat, 1, seed, mode=mode, max_steps=max_steps)
+                        runs = runs if aggregate else list(runs)
+            elif inputs is not None:
+                runs = model.run_batch(inputs, mode=mode, max_steps=max_steps, seed=seed, detect_cycles=detect_cycles,
+                                       fast_forward=fast_forward, results=results)
+            else:
+                runs = repeated(model, inp, repeat, jobs, seed, render_steps=render, render_path=render_path,
+                                render_every=render_every, render_range=render_range, render_workers=render_workers,
+                                mode=mode, max_steps=max_steps, detect_cycles=detect_cycles, checkpointer=checkpointer,
+                                resume=resume, fast_forward=fast_forward, trace=trace, results=results)
+            with trace if trace is not None else nullcontext():
+                if aggregate:
+                    print_outcomes(runs, mode)
+                else:
+                    for res in runs:
+                        print_result(res, mode)
+
+    if profiler is not None:
+        profiler.dump(profile_path)
 
 
 if __name__ == '__main__':
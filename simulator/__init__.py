@@ -0,0 +1,2 @@
+# Part of the key of the cached compiled models, increase it whenever the pickled classes change
+__version__ = '0.3.0'
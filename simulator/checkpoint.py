@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import pickle
+import time
+import typing
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+@dataclass
+class Checkpoint:
+    """
+    State of a run at the end of a step: contents, delays with the index of the pending rule,
+    active neurons, output history and random generator state
+    """
+    model: str
+    mode: str
+    step: int
+    state: Dict[T, Tuple[Tuple[str, int], ...]]
+    delay: Dict[T, Tuple[int, int]]
+    active: List[T]
+    history: typing.Any
+    seeded: bool
+    random_state: tuple
+    choice_points: int = 0
+
+    def save(self, path: str) -> None:
+        # Written aside and then renamed, so an interrupted save does not destroy the previous checkpoint
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def load(path: str) -> Checkpoint:
+        with open(path, 'rb') as f:
+            res = pickle.load(f)
+        if not isinstance(res, Checkpoint):
+            raise ValueError(f'{path} is not a checkpoint')
+        return res
+
+
+class Checkpointer:
+    """
+    Saves a checkpoint of the run to path every steps steps and/or every seconds seconds
+    """
+
+    def __init__(self, path: str, steps: Optional[int] = None, seconds: Optional[float] = None) -> None:
+        if steps is None and seconds is None:
+            raise ValueError('A checkpoint needs a period in steps or in seconds')
+        self.path: str = path
+        self.steps: Optional[int] = steps
+        self.seconds: Optional[float] = seconds
+        self._last: float = time.monotonic()
+
+    def due(self, step: int) -> bool:
+        if self.steps is not None and step % self.steps == 0:
+            return True
+        return self.seconds is not None and time.monotonic() - self._last >= self.seconds
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        checkpoint.save(self.path)
+        self._last = time.monotonic()
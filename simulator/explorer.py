@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import random
+import typing
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from simulator.history import ChannelTotals
+from simulator.snpsystem import SNPSystem, Configuration
+from utils import Multiset
+
+T = TypeVar('T')
+U = TypeVar('U')
+V = TypeVar('V')
+
+Output = typing.Union[Multiset[str], Dict[U, Multiset[str]]]
+Emitted = FrozenSet[Tuple[typing.Any, FrozenSet[Tuple[str, int]]]]
+
+
+class ScriptedChoice:
+    """
+    Stands in for the random module inside SNPSystem._run_neuron, taking the choices of a script
+    (the first option once the script is exhausted) and recording how many options each choice had.
+    """
+
+    def __init__(self, script: List[int]) -> None:
+        self.script: List[int] = script
+        self.choices: List[int] = []
+        self.options: List[int] = []
+
+    def choice(self, seq: Sequence[V]) -> V:
+        i = self.script[len(self.choices)] if len(self.choices) < len(self.script) else 0
+        self.choices.append(i)
+        self.options.append(len(seq))
+        return seq[i]
+
+    def next_script(self) -> Optional[List[int]]:
+        for i in reversed(range(len(self.choices))):
+            if self.choices[i] + 1 < self.options[i]:
+                return self.choices[:i] + [self.choices[i] + 1]
+        return None
+
+
+@dataclass
+class ExplorationStats:
+    states: int = 0
+    transitions: int = 0
+    branching_steps: int = 0
+    halting_states: int = 0
+    max_depth: int = 0
+    truncated: bool = False
+
+
+class Explorer(Generic[T, U]):
+    """
+    Explores every computation of a nondeterministic SNPSystem, branching at each rule choice and
+    deduplicating the configurations, and collects every reachable halting output.
+    """
+
+    def __init__(self, model: SNPSystem[T, U], mode: str = 'halt', max_depth: Optional[int] = None,
+                 max_states: Optional[int] = None) -> None:
+        if mode not in ('halt', 'halt-mc'):
+            raise ValueError(f'Outputs of mode {mode} depend on the whole computation, they can not be explored')
+        self.model: SNPSystem[T, U] = model
+        self.mode: str = mode
+        self.max_depth: Optional[int] = max_depth
+        self.max_states: Optional[int] = max_states
+        self.stats: ExplorationStats = ExplorationStats()
+
+    def _successors(self, configuration: Configuration) -> Iterator[Tuple[Configuration, bool, Dict[U, Multiset[str]]]]:
+        script = []
+        while script is not None:
+            chooser = ScriptedChoice(script)
+            self.model._restore(configuration)
+            self.model._random = chooser
+            self.model._history = ChannelTotals()
+            halted = self.model._halted(self.model._step())
+            self.model._update_state()
+            yield self.model._snapshot(), not halted, self.model._history.totals
+            if any(options > 1 for options in chooser.options):
+                self.stats.branching_steps += 1
+            script = chooser.next_script()
+
+    def _output(self, configuration: Configuration, emitted: Emitted) -> Output:
+        if self.mode == 'halt':
+            return Multiset.from_counts(dict(configuration[self.model._order[self.model._output]][0]))
+        return {channel: Multiset.from_counts(dict(content)) for channel, content in emitted}
+
+    def explore(self, input_data: Multiset[str]) -> List[Output]:
+        self.stats = ExplorationStats()
+        self.model._start(input_data)
+        initial = (self.model._snapshot(), frozenset())
+        seen = {initial}
+        queue = deque([(initial, 0)])
+        outputs = {}
+
+        while queue:
+            (configuration, emitted), depth = queue.popleft()
+            self.stats.max_depth = max(self.stats.max_depth, depth)
+            if self.max_depth is not None and depth >= self.max_depth:
+                self.stats.truncated = True
+                continue
+            for successor, modified, history in self._successors(configuration):
+                self.stats.transitions += 1
+                if not modified:
+                    self.stats.halting_states += 1
+                    if self.model._output is not None:
+                        key = configuration[self.model._order[self.model._output]][0] if self.mode == 'halt' else emitted
+                        outputs.setdefault(key, (configuration, emitted))
+                    continue
+                if self.mode == 'halt-mc' and history:
+                    totals = defaultdict(Multiset, {k: Multiset.from_counts(dict(v)) for k, v in emitted})
+                    for channel, spikes in history.items():
+                        totals[channel].extend(spikes)
+                    successor_emitted = frozenset((k, v.signature()) for k, v in totals.items())
+                else:
+                    successor_emitted = emitted
+                node = (successor, successor_emitted)
+                if node in seen:
+                    continue
+                if self.max_states is not None and len(seen) >= self.max_states:
+                    self.stats.truncated = True
+                    continue
+                seen.add(node)
+                queue.append((node, depth + 1))
+
+        self.model._random = random
+        self.stats.states = len(seen)
+        if self.model._output is None:
+            return [Multiset()] if self.stats.halting_states else []
+        return [self._output(configuration, emitted) for configuration, emitted in outputs.values()]
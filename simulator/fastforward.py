@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import math
+import typing
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+from utils import Multiset
+
+T = TypeVar('T')
+U = TypeVar('U')
+
+# Neuron, content when it was examined, and rules applied with the number of applications (0 if the rule blocked it)
+Examined = Tuple[T, Dict[str, int], List[Tuple[typing.Any, int]]]
+
+
+class FastForward(Generic[T, U]):
+    """
+    Detects the affine periodic regimes of a run: two consecutive periods in which the same neurons apply the same
+    rules the same number of times, so each period adds the same vector to every neuron content. The regime lasts
+    while no rule guard changes its answer along those lines, which is solved on the Parikh images of the guards,
+    and the run jumps over all those periods at once.
+    """
+
+    def __init__(self, model, max_period: int = 256) -> None:
+        self.model = model
+        self.max_period: int = max_period
+        self.jumps: int = 0
+        self.skipped: int = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self._steps: deque[List[Examined]] = deque(maxlen=2 * self.max_period)
+        self._signatures: deque[int] = deque(maxlen=self.max_period + 1)
+        # Consecutive steps equal to the step p steps before, for every period p
+        self._matches: List[int] = [0] * (self.max_period + 1)
+        self._current: List[Examined] = []
+
+    @contextmanager
+    def recording(self) -> Iterator[None]:
+        """
+        Records the rules applied by the runs of model inside the block
+        """
+        model = self.model
+        run_neuron, run_rule, block = model._run_neuron, model._run_rule, model._block
+        previous = {name: model.__dict__.get(name) for name in ('_run_neuron', '_run_rule', '_block')}
+
+        def recorded_run_neuron(neuron):
+            pending = model._pending.get(neuron)
+            if pending is not None and pending[0] > model._clock:
+                return run_neuron(neuron)
+            self._current.append((neuron, dict(model._state[neuron].map), []))
+            return run_neuron(neuron)
+
+        def recorded_run_rule(neuron, rule, times=1):
+            self._current[-1][2].append((rule, times))
+            return run_rule(neuron, rule, times)
+
+        def recorded_block(neuron, rule, delay=0):
+            # Delays restored from a checkpoint before the first step are part of the initial configuration
+            if self._current:
+                self._current[-1][2].append((rule, 0))
+            return block(neuron, rule, delay)
+
+        model._run_neuron, model._run_rule, model._block = recorded_run_neuron, recorded_run_rule, recorded_block
+        try:
+            yield
+        finally:
+            for name, method in previous.items():
+                if method is None:
+                    del model.__dict__[name]
+                else:
+                    model.__dict__[name] = method
+
+    def end_step(self) -> Optional[int]:
+        """
+        Closes the step recorded since the previous call, returns the period of the regime if the last two periods
+        applied the same rules
+        """
+        step, self._current = self._current, []
+        signature = hash(tuple((neuron, tuple((id(rule), times) for rule, times in events))
+                               for neuron, _, events in step))
+        self._steps.append(step)
+        self._signatures.append(signature)
+        for p in range(1, min(self.max_period, len(self._signatures) - 1) + 1):
+            if self._signatures[-1 - p] == signature:
+                self._matches[p] += 1
+                if self._matches[p] >= p and self._same(p):
+                    return p
+            else:
+                self._matches[p] = 0
+        return None
+
+    def _same(self, period: int) -> bool:
+        steps = list(self._steps)[-2 * period:]
+        return all([(n, e) for n, _, e in a] == [(n, e) for n, _, e in b] for a, b in zip(steps, steps[period:]))
+
+    def jump(self, period: int, limit: Optional[int] = None) -> int:
+        """
+        Skips as many periods of the regime as possible, but no more than limit, and returns how many
+        """
+        steps = list(self._steps)[-period:]
+        delta: Dict[T, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        emissions = []
+        for step in steps:
+            emitted = []
+            for neuron, _, events in step:
+                for rule, times in events:
+                    if times == 0:
+                        continue
+                    for symbol, count in rule.removed.map.items():
+                        delta[neuron][symbol] -= count * times
+                    for target, sent in rule.targets:
+                        for symbol, count in sent.map.items():
+                            delta[target][symbol] += count * times
+                    emitted.extend((channel, sent * times) for channel, sent in rule.outputs)
+            emissions.append(emitted)
+
+        periods = math.inf if limit is None else limit
+        for step in steps:
+            for neuron, content, events in step:
+                periods = min(periods, self._stable(neuron, content, events, delta.get(neuron, {})))
+                if periods <= 0:
+                    return 0
+        if periods == math.inf:
+            # The regime never ends, there is no step to jump to
+            return 0
+
+        model = self.model
+        for neuron, change in delta.items():
+            counts = model._state[neuron].map
+            model._state[neuron] = Multiset.from_counts({s: counts.get(s, 0) + periods * change.get(s, 0)
+                                                         for s in set(counts) | set(change)})
+        model._shift(periods * period)
+        model._history.repeat(emissions, periods)
+        self.jumps += 1
+        self.skipped += periods * period
+        self.reset()
+        return periods
+
+    def _stable(self, neuron: T, content: Dict[str, int], events: List[Tuple[typing.Any, int]],
+                direction: Dict[str, int]) -> float:
+        """
+        Number of periods during which the neuron, examined with content, keeps choosing the same rules
+        """
+        if not any(direction.values()):
+            return math.inf
+        rules = self.model._rules[neuron]
+        counts = dict(content)
+        periods = math.inf
+        for i, (rule, times) in enumerate(events):
+            if i == 0 and rule.block > 0 and times:
+                # A pending rule fires without checking its guard, which held when the neuron was blocked
+                counts = _minus(counts, rule.removed.map, 1)
+                continue
+            periods = min(periods, _choices(rules, counts, direction))
+            if times == 0:
+                return periods
+            if times > 1:
+                periods = min(periods, _repeated(rule, counts, times, direction))
+            counts = _minus(counts, rule.removed.map, times)
+        return min(periods, _choices(rules, counts, direction))
+
+
+def _minus(counts: Dict[str, int], removed: Dict[str, int], times: int) -> Dict[str, int]:
+    res = dict(counts)
+    for symbol, count in removed.items():
+        res[symbol] = max(res.get(symbol, 0) - count * times, 0)
+    return res
+
+
+def _holding(intervals: Optional[List[Tuple[int, float]]]) -> float:
+    """
+    Last m of the interval containing 0, merging consecutive intervals, or -1 if there is none
+    """
+    if intervals is None:
+        return 0
+    last = -1
+    for first, end in sorted(intervals):
+        if first > last + 1:
+            break
+        last = max(last, end)
+    return last
+
+
+def _choices(rules: list, counts: Dict[str, int], direction: Dict[str, int]) -> float:
+    """
+    Number of periods during which every rule keeps its applicability along counts + m * direction
+    """
+    periods = math.inf
+    for rule in rules:
+        intervals = rule.guard.line(counts, direction, rule.removed.map)
+        if intervals is None:
+            return 0
+        holding = _holding(intervals)
+        if holding >= 0:
+            periods = min(periods, holding)
+        else:
+            periods = min([periods] + [first - 1 for first, _ in intervals])
+    return periods
+
+
+def _repeated(rule, counts: Dict[str, int], times: int, direction: Dict[str, int]) -> float:
+    """
+    Number of periods during which the rule can still be applied times times in a row
+    """
+    if rule.guard.universal or len(rule.guard.linear_sets) == 1:
+        # The contents where the rule is applicable form a convex set, so the first and last application suffice
+        applications = [times - 1]
+    elif times <= 8:
+        applications = range(1, times)
+    else:
+        return 0
+    return min(_holding(rule.guard.line(_minus(counts, rule.removed.map, i), direction, rule.removed.map))
+               for i in applications)
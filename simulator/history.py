@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import typing
+from collections import defaultdict
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from utils import Multiset
+
+U = TypeVar('U')
+
+
+class History(Generic[U]):
+    """
+    Receives the spikes sent to the output neuron during a run, step by step.
+    The base class discards them, which is all the halt mode needs.
+    """
+
+    def begin_step(self) -> None:
+        pass
+
+    def record(self, channel: U, spikes: Multiset[str]) -> None:
+        pass
+
+    def result(self) -> typing.Any:
+        return None
+
+    def repeat(self, steps: List[List[Tuple[U, Multiset[str]]]], times: int) -> None:
+        """
+        Records times more the emissions of steps, one list of (channel, spikes) per step
+        """
+        pass
+
+
+class ChannelTotals(History[U]):
+    """
+    Running total of the spikes sent through each channel (halt-mc mode)
+    """
+
+    def __init__(self) -> None:
+        self.totals: Dict[U, Multiset[str]] = defaultdict(Multiset)
+
+    def record(self, channel: U, spikes: Multiset[str]) -> None:
+        self.totals[channel].extend(spikes)
+
+    def result(self) -> Dict[U, Multiset[str]]:
+        return self.totals
+
+    def repeat(self, steps: List[List[Tuple[U, Multiset[str]]]], times: int) -> None:
+        for emissions in steps:
+            for channel, spikes in emissions:
+                self.totals[channel].extend(spikes * times)
+
+
+class StepSeries(History[U]):
+    """
+    Spikes sent at each step, by channel (time-mc mode) or merged (time mode)
+    """
+
+    def __init__(self, merge_channels: bool = False) -> None:
+        self.merge_channels: bool = merge_channels
+        self.series: List[typing.Union[Multiset[str], Dict[U, Multiset[str]]]] = []
+
+    def begin_step(self) -> None:
+        self.series.append(Multiset() if self.merge_channels else defaultdict(Multiset))
+
+    def record(self, channel: U, spikes: Multiset[str]) -> None:
+        if self.merge_channels:
+            self.series[-1].extend(spikes)
+        else:
+            self.series[-1][channel].extend(spikes)
+
+    def result(self) -> List[typing.Union[Multiset[str], Dict[U, Multiset[str]]]]:
+        return self.series
+
+    def repeat(self, steps: List[List[Tuple[U, Multiset[str]]]], times: int) -> None:
+        for _ in range(times):
+            for emissions in steps:
+                self.begin_step()
+                for channel, spikes in emissions:
+                    self.record(channel, spikes)
+
+
+class CallbackHistory(History[U]):
+    """
+    Calls callback(step, channel, spikes) for every emission to the output neuron, steps start at 1
+    """
+
+    def __init__(self, callback: Callable[[int, U, Multiset[str]], None]) -> None:
+        self.callback: Optional[Callable[[int, U, Multiset[str]], None]] = callback
+        self.step: int = 0
+
+    def __getstate__(self) -> dict:
+        # Callbacks are rarely picklable, a checkpoint only keeps the step
+        return {'callback': None, 'step': self.step}
+
+    def begin_step(self) -> None:
+        self.step += 1
+
+    def record(self, channel: U, spikes: Multiset[str]) -> None:
+        self.callback(self.step, channel, spikes)
+
+    def repeat(self, steps: List[List[Tuple[U, Multiset[str]]]], times: int) -> None:
+        for _ in range(times):
+            for emissions in steps:
+                self.begin_step()
+                for channel, spikes in emissions:
+                    self.record(channel, spikes)
+
+
+def history_for(mode: str, callback: Optional[Callable[[int, U, Multiset[str]], None]] = None) -> History[U]:
+    if callback is not None:
+        return CallbackHistory(callback)
+    match mode:
+        case 'halt':
+            return History()
+        case 'halt-mc':
+            return ChannelTotals()
+        case 'time':
+            return StepSeries(merge_channels=True)
+        case 'time-mc':
+            return StepSeries()
+    raise ValueError(f'Unknown mode {mode}')
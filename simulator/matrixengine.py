@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import typing
+from typing import Dict, Generic, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import numpy as np
+
+from automatons import SemilinearSet
+from simulator import profiler
+from simulator.history import History, history_for
+from simulator.snpsystem import SNPSystem, Rule
+from utils import LRUCache, Multiset
+
+T = TypeVar('T')
+U = TypeVar('U')
+
+INF = 2 ** 62
+
+
+class MatrixEngine(Generic[T, U]):
+    """
+    Runs a finished SNPSystem as integer array operations over a neuron x symbol count matrix,
+    a rule consumption matrix and a flattened (rule, target, symbol) emission matrix.
+    """
+
+    def __init__(self, model: SNPSystem[T, U]) -> None:
+        self.model: SNPSystem[T, U] = model
+        self.neurons: List[T] = list(model._ms.keys())
+        self.neuron_index: Dict[T, int] = {n: i for i, n in enumerate(self.neurons)}
+        self.rules: List[Tuple[int, Rule]] = [(self.neuron_index[n], rule) for n in self.neurons for rule in model._rules[n]]
+        self.guards: List[SemilinearSet] = [rule.guard for _, rule in self.rules]
+        self.channels: List[U] = list(model._channels.keys())
+
+        symbols = set()
+        for content in model._ms.values():
+            symbols |= content.set()
+        for (_, rule), guard in zip(self.rules, self.guards):
+            symbols |= rule.removed.set() | set(guard.alphabet)
+            for sent in rule.channels.values():
+                symbols |= sent.set()
+        self._compile(symbols)
+
+    def _compile(self, symbols: Set[str]) -> None:
+        self.symbols: List[str] = sorted(symbols)
+        self.symbol_index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        # Result of the guards checked in python for each (rule, neuron content), shared by every run of the engine
+        self._guard_cache: LRUCache[Tuple[int, bytes], bool] = LRUCache(4096)
+        n, r, s = len(self.neurons), len(self.rules), len(self.symbols)
+
+        self.initial = np.zeros((n, s), dtype=np.int64)
+        for neuron, content in self.model._ms.items():
+            for symbol, count in content.map.items():
+                self.initial[self.neuron_index[neuron], self.symbol_index[symbol]] += count
+
+        self.rule_neuron = np.array([i for i, _ in self.rules], dtype=np.int64)
+        self.consume = np.zeros((r, s), dtype=np.int64)
+        self.forgetting = np.array([rule.forgetting for _, rule in self.rules], dtype=bool)
+        self.blocking = np.array([rule.block > 0 for _, rule in self.rules], dtype=bool)
+
+        # Guards made of a single box are checked and bounded with array operations, the others in python
+        self.guard_base = np.zeros((r, s), dtype=np.int64)
+        self.guard_exact = np.zeros((r, s), dtype=bool)
+        self.python_guard = np.zeros(r, dtype=bool)
+        for i, ((_, rule), guard) in enumerate(zip(self.rules, self.guards)):
+            for symbol, count in rule.removed.map.items():
+                self.consume[i, self.symbol_index[symbol]] += count
+            if not self.consume[i].any():
+                raise ValueError(f'Rule {rule} does not consume any spike, so it can be applied forever')
+            if guard.universal:
+                continue
+            if not guard.box or len(guard.linear_sets) != 1:
+                self.python_guard[i] = True
+                continue
+            linear_set = guard.linear_sets[0]
+            self.guard_exact[i] = True
+            for j, symbol in enumerate(guard.alphabet):
+                self.guard_base[i, self.symbol_index[symbol]] = linear_set.base[j]
+                self.guard_exact[i, self.symbol_index[symbol]] = j not in linear_set.free
+
+        emissions = []
+        outputs = []
+        touched = set()
+        channel_index = {c: i for i, c in enumerate(self.channels)}
+        for i, (neuron, rule) in enumerate(self.rules):
+            for channel, sent in rule.channels.items():
+                for target in self.model._channels[channel][self.neurons[neuron]]:
+                    for symbol, count in sent.map.items():
+                        emissions.append((i, self.neuron_index[target], self.symbol_index[symbol], count))
+                        if target == self.model._output:
+                            outputs.append((i, channel_index[channel], self.symbol_index[symbol], count))
+                    if target == self.model._output:
+                        touched.add((i, channel_index[channel]))
+        self.emit_rule, self.emit_target, self.emit_symbol, self.emit_count = \
+            (np.array(column, dtype=np.int64) for column in zip(*emissions)) if emissions else (np.zeros(0, np.int64),) * 4
+        self.out_rule, self.out_channel, self.out_symbol, self.out_count = \
+            (np.array(column, dtype=np.int64) for column in zip(*outputs)) if outputs else (np.zeros(0, np.int64),) * 4
+        self.touched_rule, self.touched_channel = \
+            (np.array(column, dtype=np.int64) for column in zip(*sorted(touched))) if touched else (np.zeros(0, np.int64),) * 2
+
+    def deterministic(self) -> bool:
+        return self.model.deterministic()
+
+    def _counts(self, row: np.ndarray) -> Dict[str, int]:
+        return {self.symbols[j]: int(row[j]) for j in np.flatnonzero(row)}
+
+    def _contains(self, rule: int, content: np.ndarray) -> bool:
+        key = (rule, content.tobytes())
+        res = self._guard_cache.get(key)
+        if res is None:
+            res = self._guard_cache[key] = self.guards[rule].contains(self._counts(content))
+        return res
+
+    def _applicable(self, state: np.ndarray) -> np.ndarray:
+        content = state[:, self.rule_neuron]
+        valid = (content >= self.consume).all(axis=2)
+        valid &= np.where(self.guard_exact, content == self.guard_base, content >= self.guard_base).all(axis=2)
+        for b, i in zip(*np.nonzero(self.python_guard & valid)):
+            valid[b, i] = self._contains(i, content[b, i])
+        return valid
+
+    def _applications(self, state: np.ndarray, batch: np.ndarray, rules: np.ndarray) -> np.ndarray:
+        content = state[batch, self.rule_neuron[rules]]
+        consumed = self.consume[rules]
+        divisor = np.maximum(consumed, 1)
+        res = np.where(consumed > 0, content // divisor, INF).min(axis=1)
+        base, exact = self.guard_base[rules], self.guard_exact[rules]
+        free_bound = np.where(~exact & (consumed > 0), (content - base) // divisor, INF).min(axis=1)
+        exact_bound = np.where(exact & (consumed > 0), 0, INF).min(axis=1)
+        res = np.minimum(res, np.minimum(free_bound, exact_bound) + 1)
+        for j in np.flatnonzero(self.python_guard[rules]):
+            i = rules[j]
+            res[j] = self.guards[i].run_length(self._counts(content[j]), self._counts(consumed[j]), int(res[j]))
+        return res
+
+    def _choose(self, candidates: np.ndarray, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        batch, rules = np.nonzero(candidates)
+        order = np.lexsort((rng.random(len(rules)), self.rule_neuron[rules], batch))
+        batch, rules = batch[order], rules[order]
+        neurons = self.rule_neuron[rules]
+        last = np.ones(len(rules), dtype=bool)
+        last[:-1] = (neurons[1:] != neurons[:-1]) | (batch[1:] != batch[:-1])
+        return batch[last], rules[last]
+
+    def _step(self, state: np.ndarray, delay: np.ndarray, pending: np.ndarray, rng: np.random.Generator) -> \
+            Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        applied = np.zeros((len(state), len(self.rules)), dtype=np.int64)
+
+        waiting = delay > 0
+        batch, due = np.nonzero(delay == 0)
+        delay[waiting] -= 1
+        delay[batch, due] = -1
+        np.add.at(applied, (batch, pending[batch, due]), 1)
+        state[batch, due] -= self.consume[pending[batch, due]]
+        modified = waiting.any(axis=1)
+        modified[batch] = True
+
+        free = ~waiting
+        while True:
+            valid = self._applicable(state) & free[:, self.rule_neuron]
+            if not valid.any():
+                break
+            modified |= valid.any(axis=1)
+            firing = np.zeros(free.shape, dtype=bool)
+            batch, rules = np.nonzero(valid & ~self.forgetting)
+            firing[batch, self.rule_neuron[rules]] = True
+            batch, chosen = self._choose(valid & (~self.forgetting | ~firing[:, self.rule_neuron]), rng)
+
+            blocking = self.blocking[chosen]
+            blocked, neurons = batch[blocking], self.rule_neuron[chosen[blocking]]
+            delay[blocked, neurons] = 0
+            pending[blocked, neurons] = chosen[blocking]
+            free[blocked, neurons] = False
+
+            batch, fired = batch[~blocking], chosen[~blocking]
+            times = self._applications(state, batch, fired)
+            state[batch, self.rule_neuron[fired]] -= times[:, None] * self.consume[fired]
+            applied[batch, fired] += times
+
+        rows = np.arange(len(state))[:, None]
+        np.add.at(state, (rows, self.emit_target, self.emit_symbol), applied[:, self.emit_rule] * self.emit_count)
+        output = np.zeros((len(state), len(self.channels), len(self.symbols)), dtype=np.int64)
+        np.add.at(output, (rows, self.out_channel, self.out_symbol), applied[:, self.out_rule] * self.out_count)
+        return modified, output, applied
+
+    def _multiset(self, row: np.ndarray) -> Multiset[str]:
+        return Multiset.from_counts(self._counts(row))
+
+    def run(self, input_data: Multiset[str], mode: str = 'halt', max_steps: Optional[int] = None,
+            seed: Optional[int] = None) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]:
+        return self.run_batch([input_data], mode, max_steps, seed)[0]
+
+    def run_batch(self, inputs: Sequence[Multiset[str]], mode: str = 'halt', max_steps: Optional[int] = None,
+                  seed: Optional[int] = None) -> \
+            List[typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]]:
+        """
+        Runs every input at once, stacking their configurations into a batch x neuron x symbol array that each step
+        advances together. The runs that halt leave the batch, the results are returned in the order of inputs.
+        """
+        symbols = set().union(*(input_data.set() for input_data in inputs))
+        if not symbols <= set(self.symbols):
+            self._compile(set(self.symbols) | symbols)
+
+        state = np.repeat(self.initial[None], len(inputs), axis=0)
+        if self.model._input is not None:
+            neuron = self.neuron_index[self.model._input]
+            for i, input_data in enumerate(inputs):
+                for symbol, count in input_data.map.items():
+                    state[i, neuron, self.symbol_index[symbol]] += count
+        delay = np.full((len(inputs), len(self.neurons)), -1, dtype=np.int64)
+        pending = np.zeros((len(inputs), len(self.neurons)), dtype=np.int64)
+        rng = np.random.default_rng(seed)
+
+        with profiler.phase('simulation'):
+            return self._run(state, delay, pending, rng, mode, max_steps)
+
+    def _run(self, state: np.ndarray, delay: np.ndarray, pending: np.ndarray, rng: np.random.Generator, mode: str,
+             max_steps: Optional[int]) -> \
+            List[typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]]:
+        histories = [history_for(mode) for _ in range(len(state))]
+        results = [None] * len(state)
+        # Position in the batch of the runs that did not halt yet
+        rows = np.arange(len(state))
+        step = 0
+        while len(rows):
+            step += 1
+            modified, output, applied = self._step(state, delay, pending, rng)
+            for i, row in enumerate(rows):
+                history = histories[row]
+                history.begin_step()
+                if mode != 'halt':
+                    for channel in np.unique(self.touched_channel[applied[i, self.touched_rule] > 0]):
+                        history.record(self.channels[channel], self._multiset(output[i, channel]))
+            halted = np.ones(len(rows), dtype=bool) if max_steps and step == max_steps else ~modified
+            for i in np.flatnonzero(halted):
+                results[rows[i]] = self._result(state[i], histories[rows[i]], mode)
+            if halted.any():
+                rows, state, delay, pending = rows[~halted], state[~halted], delay[~halted], pending[~halted]
+        return results
+
+    def _result(self, state: np.ndarray, history: History[U], mode: str) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]:
+        if self.model._output is not None:
+            if mode == 'halt':
+                return self._multiset(state[self.neuron_index[self.model._output]])
+            return history.result()
+        return Multiset()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import multiprocessing
+import pickle
+import random
+import typing
+from typing import Any, Iterator, List, Optional
+
+from utils import Multiset
+
+Runner = Any
+Result = Any
+
+_worker_runner: Optional[Runner] = None
+
+
+def derive_seeds(seed: Optional[int], count: int) -> List[int]:
+    """
+    Independent seed of each run, all of them reproducible from the master seed
+    """
+    rng = random.Random(seed) if seed is not None else random.Random(random.getrandbits(64))
+    return [rng.getrandbits(64) for _ in range(count)]
+
+
+def _init_worker(runner: bytes) -> None:
+    global _worker_runner
+    _worker_runner = pickle.loads(runner)
+
+
+def _run_worker(args: typing.Tuple[Multiset[str], int, dict]) -> Result:
+    input_data, seed, kwargs = args
+    return _worker_runner.run(input_data, seed=seed, **kwargs)
+
+
+def run_repeated(runner: Runner, input_data: Multiset[str], repeat: int, jobs: int = 1, seed: Optional[int] = None,
+                 **kwargs) -> Iterator[Result]:
+    """
+    Runs the model (SNPSystem or MatrixEngine) repeat times, spreading the runs across jobs processes.
+    The model is sent once to each worker and the results are yielded in run order as they complete.
+    A deterministic model runs only once and its result is yielded repeat times.
+    """
+    if repeat > 1 and runner.deterministic():
+        res = runner.run(input_data, **kwargs)
+        for _ in range(repeat):
+            yield res
+        return
+
+    if jobs <= 1:
+        if seed is None:
+            for _ in range(repeat):
+                yield runner.run(input_data, **kwargs)
+        else:
+            for run_seed in derive_seeds(seed, repeat):
+                yield runner.run(input_data, seed=run_seed, **kwargs)
+        return
+
+    tasks = [(input_data, run_seed, kwargs) for run_seed in derive_seeds(seed, repeat)]
+    with multiprocessing.Pool(jobs, initializer=_init_worker, initargs=(pickle.dumps(runner),)) as pool:
+        yield from pool.imap(_run_worker, tasks, chunksize=max(1, min(64, repeat // (jobs * 8))))
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import heapq
+import math
+import multiprocessing
+import typing
+from collections import defaultdict
+from copy import copy
+from multiprocessing.connection import Connection
+from typing import Dict, Generic, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from simulator.history import History, history_for
+from simulator.parallel import derive_seeds
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+T = TypeVar('T')
+U = TypeVar('U')
+
+# Spikes sent to each neuron, as symbol counts
+Spikes = Dict[T, Dict[str, int]]
+
+
+def synapse_graph(model: SNPSystem[T, U]) -> Dict[T, Dict[T, int]]:
+    """
+    Undirected graph of the neurons, weighted by the number of channels joining each pair
+    """
+    graph: Dict[T, Dict[T, int]] = {n: defaultdict(int) for n in model._ms.keys()}
+    for synapses in model._channels.values():
+        for source, targets in synapses.items():
+            for target in targets:
+                if target != source:
+                    graph[source][target] += 1
+                    graph[target][source] += 1
+    return graph
+
+
+def partition(model: SNPSystem[T, U], parts: int, passes: int = 4) -> Dict[T, int]:
+    """
+    Splits the neurons into parts of at most ceil(n / parts) neurons, trying to cut as few synapses as possible.
+    Each part grows from its first free neuron by adding the free neuron with most synapses into the part, then
+    boundary neurons move to the part holding most of their neighbours while the sizes allow it.
+    """
+    graph = synapse_graph(model)
+    neurons = list(graph.keys())
+    capacity = math.ceil(len(neurons) / parts) if neurons else 0
+    assignment: Dict[T, int] = {}
+    order = {n: i for i, n in enumerate(neurons)}
+    sizes = [0] * parts
+
+    free = iter(neurons)
+    for part in range(parts):
+        gains: Dict[T, int] = defaultdict(int)
+        heap: List[Tuple[int, int, T]] = []
+        while sizes[part] < capacity:
+            neuron = None
+            while heap:
+                gain, _, candidate = heapq.heappop(heap)
+                if candidate not in assignment and -gain == gains[candidate]:
+                    neuron = candidate
+                    break
+            if neuron is None:
+                neuron = next((n for n in free if n not in assignment), None)
+                if neuron is None:
+                    break
+            assignment[neuron] = part
+            sizes[part] += 1
+            for neighbour, weight in graph[neuron].items():
+                if neighbour not in assignment:
+                    gains[neighbour] += weight
+                    heapq.heappush(heap, (-gains[neighbour], order[neighbour], neighbour))
+
+    for _ in range(passes):
+        moved = False
+        for neuron in neurons:
+            current = assignment[neuron]
+            links = defaultdict(int)
+            for neighbour, weight in graph[neuron].items():
+                links[assignment[neighbour]] += weight
+            best = max((p for p in links if sizes[p] < capacity), key=lambda p: (links[p], -p), default=current)
+            if links[best] > links[current]:
+                assignment[neuron] = best
+                sizes[current] -= 1
+                sizes[best] += 1
+                moved = True
+        if not moved:
+            break
+    return assignment
+
+
+def cut(model: SNPSystem[T, U], assignment: Dict[T, int]) -> int:
+    """
+    Number of synapses joining neurons of different parts
+    """
+    return sum(assignment[source] != assignment[target]
+               for synapses in model._channels.values()
+               for source, targets in synapses.items() for target in targets)
+
+
+class _Emissions(History[U]):
+    """
+    Spikes sent to the output neuron during the current step, collected to be sent to the coordinator
+    """
+
+    def __init__(self) -> None:
+        self.emissions: List[Tuple[U, Dict[str, int]]] = []
+
+    def record(self, channel: U, spikes: Multiset[str]) -> None:
+        self.emissions.append((channel, dict(spikes.map)))
+
+
+def _serve(conn: Connection, model: SNPSystem[T, U], owned: Set[T], assignment: Dict[T, int]) -> None:
+    """
+    Worker loop: runs the neurons of a part one step at a time, keeping the spikes sent inside the part and
+    answering with those sent to other parts
+    """
+    history = _Emissions()
+    while True:
+        message = conn.recv()
+        match message:
+            case ('start', input_data, seed):
+                model._start(input_data if model._input in owned else Multiset(), seed, history)
+                model._active &= owned
+            case ('step', received):
+                for neuron, counts in received.items():
+                    model._incoming[neuron].extend(Multiset.from_counts(counts))
+                model._update_state()
+                history.emissions = []
+                modified = model._step()
+                remote: Dict[int, Spikes] = defaultdict(dict)
+                for neuron in [n for n in model._incoming if n not in owned]:
+                    remote[assignment[neuron]][neuron] = dict(model._incoming.pop(neuron).map)
+                conn.send((modified, bool(model._wheel), history.emissions, dict(remote)))
+            case ('finish', received):
+                for neuron, counts in received.items():
+                    model._incoming[neuron].extend(Multiset.from_counts(counts))
+                model._update_state()
+                conn.send(copy(model._state[model._output]) if model._output in owned else None)
+            case ('close',):
+                conn.close()
+                return
+
+
+class PartitionedEngine(Generic[T, U]):
+    """
+    Runs a finished SNPSystem with its neurons split across worker processes. In every step each worker fires its
+    own neurons, then the spikes crossing the cut synapses are exchanged through pipes, together with the next step.
+    Deterministic models give the same results as SNPSystem.run, the rest draw their choices from one random
+    generator per worker.
+    """
+
+    def __init__(self, model: SNPSystem[T, U], workers: int = 2, assignment: Optional[Dict[T, int]] = None) -> None:
+        if workers < 1:
+            raise ValueError('A model can not be split across less than one worker')
+        model.finalize()
+        self.model: SNPSystem[T, U] = model
+        self.workers: int = workers
+        self.assignment: Dict[T, int] = assignment if assignment is not None else partition(model, workers)
+        self._connections: List[Connection] = []
+        self._processes: List[multiprocessing.Process] = []
+
+    def deterministic(self) -> bool:
+        return self.model.deterministic()
+
+    def __enter__(self) -> PartitionedEngine[T, U]:
+        self.open()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def open(self) -> None:
+        if self._processes:
+            return
+        parts: Dict[int, Set[T]] = defaultdict(set)
+        for neuron, part in self.assignment.items():
+            parts[part].add(neuron)
+        for part in range(self.workers):
+            conn, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve, args=(child, self.model, parts[part], self.assignment),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(conn)
+            self._processes.append(process)
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.send(('close',))
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._connections, self._processes = [], []
+
+    def run(self, input_data: Multiset[str], mode: str = 'halt', max_steps: Optional[int] = None,
+            seed: Optional[int] = None) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]:
+        self.open()
+        history = history_for(mode)
+        for conn, worker_seed in zip(self._connections, derive_seeds(seed, self.workers)):
+            conn.send(('start', input_data, worker_seed))
+
+        inboxes: List[Spikes] = [{} for _ in range(self.workers)]
+        step = 0
+        while True:
+            history.begin_step()
+            step += 1
+            for conn, inbox in zip(self._connections, inboxes):
+                conn.send(('step', inbox))
+            inboxes = [{} for _ in range(self.workers)]
+            modified = blocked = False
+            for conn in self._connections:
+                worker_modified, worker_blocked, emissions, remote = conn.recv()
+                modified |= worker_modified
+                blocked |= worker_blocked
+                for channel, counts in emissions:
+                    history.record(channel, Multiset.from_counts(counts))
+                for part, spikes in remote.items():
+                    for neuron, counts in spikes.items():
+                        received = inboxes[part].setdefault(neuron, {})
+                        for symbol, count in counts.items():
+                            received[symbol] = received.get(symbol, 0) + count
+            if not modified and not blocked:
+                break
+            if max_steps and step >= max_steps:
+                break
+
+        for conn, inbox in zip(self._connections, inboxes):
+            conn.send(('finish', inbox))
+        outputs = [conn.recv() for conn in self._connections]
+        if self.model._output is None:
+            return Multiset()
+        if mode == 'halt':
+            return next(res for res in outputs if res is not None)
+        return history.result()
+
+    def run_batch(self, inputs: Sequence[Multiset[str]], mode: str = 'halt', max_steps: Optional[int] = None,
+                  seed: Optional[int] = None) -> list:
+        seeds = derive_seeds(seed, len(inputs)) if seed is not None else [None] * len(inputs)
+        return [self.run(input_data, mode=mode, max_steps=max_steps, seed=run_seed)
+                for input_data, run_seed in zip(inputs, seeds)]
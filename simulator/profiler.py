@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# Profiler collecting the measures, None while profiling is disabled
+ACTIVE: Optional[Profiler] = None
+
+
+class _NeuronProfile:
+    def __init__(self) -> None:
+        self.time: float = 0.
+        self.matching: float = 0.
+        self.matches: int = 0
+        self.delivery: float = 0.
+        self.firings: int = 0
+        self.applications: int = 0
+
+    def report(self) -> dict:
+        return {'time': self.time, 'selection': self.time - self.delivery, 'matching': self.matching,
+                'matches': self.matches, 'delivery': self.delivery, 'firings': self.firings,
+                'applications': self.applications}
+
+
+class Profiler:
+    """
+    Records the wall time of each phase (scanning, parsing, interpretation, rule construction, simulation...),
+    of each simulation step, and per neuron the time spent selecting rules, matching their regular expressions
+    and delivering spikes. While it is active, SNPSystem runs are instrumented by replacing their methods on the
+    instance, so runs without profiler execute the plain code.
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.steps: List[float] = []
+        self.neurons: Dict[str, _NeuronProfile] = defaultdict(_NeuronProfile)
+        self._previous: Optional[Profiler] = None
+
+    def __enter__(self) -> Profiler:
+        global ACTIVE
+        self._previous, ACTIVE = ACTIVE, self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global ACTIVE
+        ACTIVE = self._previous
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    @contextmanager
+    def instrument(self, model) -> Iterator[None]:
+        """
+        Measures the steps and neurons of the runs of model inside the block
+        """
+        run_neuron, run_rule, step = model._run_neuron, model._run_rule, model._step
+        neurons = self.neurons
+
+        def profiled_step():
+            start = time.perf_counter()
+            res = step()
+            self.steps.append(time.perf_counter() - start)
+            return res
+
+        def profiled_run_neuron(neuron):
+            start = time.perf_counter()
+            res = run_neuron(neuron)
+            neurons[str(neuron)].time += time.perf_counter() - start
+            return res
+
+        def profiled_run_rule(neuron, rule, times=1):
+            start = time.perf_counter()
+            res = run_rule(neuron, rule, times)
+            profile = neurons[str(neuron)]
+            profile.delivery += time.perf_counter() - start
+            profile.firings += 1
+            profile.applications += times
+            return res
+
+        def profiled_applicable(neuron, applicable):
+            def wrapper(multiset):
+                start = time.perf_counter()
+                res = applicable(multiset)
+                profile = neurons[str(neuron)]
+                profile.matching += time.perf_counter() - start
+                profile.matches += 1
+                return res
+            return wrapper
+
+        model._step, model._run_neuron, model._run_rule = profiled_step, profiled_run_neuron, profiled_run_rule
+        for neuron, neuron_rules in model._rules.items():
+            for rule in neuron_rules:
+                rule.applicable = profiled_applicable(neuron, rule.applicable)
+        try:
+            with self.phase('simulation'):
+                yield
+        finally:
+            for name in ('_step', '_run_neuron', '_run_rule'):
+                del model.__dict__[name]
+            for neuron_rules in model._rules.values():
+                for rule in neuron_rules:
+                    del rule.__dict__['applicable']
+
+    def report(self) -> dict:
+        total = sum(self.steps)
+        return {
+            'phases': dict(self.phases),
+            'steps': {'count': len(self.steps), 'total': total, 'mean': total / len(self.steps) if self.steps else 0.,
+                      'max': max(self.steps, default=0.), 'times': self.steps},
+            'neurons': {neuron: profile.report() for neuron, profile in self.neurons.items()},
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Measures the block as a phase of the active profiler, if any
+    """
+    if ACTIVE is None:
+        yield
+    else:
+        with ACTIVE.phase(name):
+            yield
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Generic, Optional, Tuple, TypeVar
+
+from utils import Multiset
+
+T = TypeVar('T')
+
+# Content of every neuron as (symbol, count) pairs, in the order of the neuron multisets
+Snapshot = Dict[T, Tuple[Tuple[str, int], ...]]
+
+
+class RenderPipeline(Generic[T]):
+    """
+    Renders the steps of a run in a pool of worker threads, so the simulation does not wait for graphviz.
+    The simulator only takes a snapshot of the contents, and blocks when max_pending renders are queued.
+    Only the steps multiple of every and inside steps=(first, last) are rendered.
+    """
+
+    def __init__(self, model, path: str, name: str = 'SNP-System', every: int = 1,
+                 steps: Optional[Tuple[int, int]] = None, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None) -> None:
+        if every < 1:
+            raise ValueError('Steps can not be rendered every less than one step')
+        self.model = model
+        self.path: str = path
+        self.name: str = name
+        self.every: int = every
+        self.steps: Optional[Tuple[int, int]] = steps
+        workers = workers or min(4, os.cpu_count() or 1)
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(workers, thread_name_prefix='render')
+        self._slots: threading.BoundedSemaphore = threading.BoundedSemaphore(max_pending or 2 * workers)
+        self._failed: Optional[Future] = None
+
+    def __enter__(self) -> RenderPipeline[T]:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def wants(self, step: int) -> bool:
+        if self.steps is not None and not self.steps[0] <= step <= self.steps[1]:
+            return False
+        return step % self.every == 0
+
+    def submit(self, step: int, state: Dict[T, Multiset[str]]) -> None:
+        if not self.wants(step):
+            return
+        # A failed render stops the run instead of failing again on every step
+        if self._failed is not None:
+            self.close()
+        snapshot = {neuron: tuple(content.map.items()) for neuron, content in state.items()}
+        self._slots.acquire()
+        self._executor.submit(self._render, f'{self.name}.{step}', snapshot).add_done_callback(self._done)
+
+    def _done(self, future: Future) -> None:
+        if self._failed is None and not future.cancelled() and future.exception() is not None:
+            self._failed = future
+        self._slots.release()
+
+    def _render(self, name: str, snapshot: Snapshot) -> None:
+        contents = {neuron: Multiset.from_counts(dict(content)) for neuron, content in snapshot.items()}
+        self.model.graph(contents, name).render(self.path)
+
+    def close(self) -> None:
+        """
+        Waits for the queued renders and raises the first error among them
+        """
+        self._executor.shutdown(wait=True, cancel_futures=self._failed is not None)
+        if self._failed is not None:
+            self._failed.result()
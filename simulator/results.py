@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import typing
+from typing import Optional
+
+from simulator import __version__
+from utils import DiskCache, Multiset
+
+Result = typing.Any
+
+
+class ResultCache:
+    """
+    Results of runs stored on disk, keyed by the model digest, the input, the mode, the options that change the
+    result and the seed. Deterministic models are keyed without seed, since every seed gives the same result,
+    and runs of nondeterministic models without seed are not cached. The least recently used results are evicted
+    when they take more than max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = 1 << 30) -> None:
+        self.cache: DiskCache = DiskCache(path, max_bytes)
+
+    def key(self, model, input_data: Multiset[str], mode: str, seed: Optional[int], **options) -> Optional[str]:
+        if model.deterministic():
+            seed = 'deterministic'
+        elif seed is None:
+            return None
+        counts = sorted((s, c) for s, c in input_data.map.items() if c > 0)
+        return DiskCache.key(__version__, model.digest(), repr(counts), mode, str(seed),
+                             repr(sorted(options.items())))
+
+    def get(self, key: str) -> Optional[Result]:
+        return self.cache.get(key)
+
+    def __setitem__(self, key: str, result: Result) -> None:
+        self.cache[key] = result
+
+    def info(self) -> typing.Dict[str, int]:
+        return {'hits': self.cache.hits, 'misses': self.cache.misses, 'evictions': self.cache.evictions}
@@ -1,20 +1,34 @@
 from __future__ import annotations
 
+import hashlib
 import random
 import re
 import typing
 from collections import defaultdict
-from copy import deepcopy
-from typing import Dict, List, TypeVar, Generic, Set, Optional, Tuple
+from contextlib import nullcontext
+from copy import copy, deepcopy
+from itertools import combinations
+from typing import Dict, FrozenSet, List, TypeVar, Generic, Set, Optional, Tuple
 from dataclasses import dataclass
 from utils.graphrenderer import GraphRenderer
 
-from automatons import DFA
-from utils import Multiset
+from automatons import DFA, SemilinearSet
+from simulator import profiler
+from simulator.checkpoint import Checkpoint, Checkpointer
+from simulator.fastforward import FastForward
+from simulator.history import CallbackHistory, History, history_for
+from simulator.parallel import derive_seeds
+from simulator.rendering import RenderPipeline
+from simulator.results import ResultCache
+from simulator.trace import TraceWriter
+from utils import FrozenMultiset, LRUCache, Multiset
 
 T = TypeVar('T')
 U = TypeVar('U')
 
+# Content signature, delay and index of the pending rule (-1 if none) of every neuron
+Configuration = Tuple[Tuple[FrozenSet[Tuple[str, int]], int, int], ...]
+
 
 class Rule:
     def __init__(self, regex: Optional[typing.Union[str, List[str]]], removed: Multiset[str], channels: Dict[U, Multiset[str]], block: int):
@@ -24,6 +38,17 @@ class Rule:
         self.channels: Dict[str, Multiset[str]] = channels
         self.forgetting: bool = len(channels) == 0
         self.block: int = block
+        # Emission plan filled by SNPSystem.finalize: spikes received by each target neuron, merged across channels,
+        # and spikes recorded by each channel that reaches the output neuron
+        self.targets: Tuple[Tuple[typing.Any, Multiset[str]], ...] = ()
+        self.outputs: Tuple[Tuple[U, Multiset[str]], ...] = ()
+        # Parikh image of the rule condition, so it can be checked on spike counts
+        if self.forgetting:
+            self.guard: SemilinearSet = SemilinearSet.universe()
+        elif self.regex is None:
+            self.guard: SemilinearSet = SemilinearSet.singleton(removed)
+        else:
+            self.guard: SemilinearSet = SemilinearSet.from_RegEx(regex)
 
     def __str__(self):
         synapses = ', '.join(f'{content} <{channel}>' for channel, content in self.channels.items())
@@ -40,12 +65,24 @@ class Rule:
         return str(self)
 
     def valid(self, multiset: Multiset[str]) -> bool:
-        if self.forgetting:
-            return True
-        elif self.regex is None:
-            return self.removed == multiset
-        else:
-            return self.regex.accepts_multiset(multiset)
+        return self.guard.accepts_multiset(multiset)
+
+    def applicable(self, multiset: Multiset[str]) -> bool:
+        return all(multiset.count(s) >= c for s, c in self.removed.map.items()) and self.valid(multiset)
+
+    def excludes(self, other: Rule) -> bool:
+        """
+        Whether no neuron content makes both rules applicable, proved on the Parikh images of their regexes
+        """
+        lower = {s: max(self.removed.count(s), other.removed.count(s)) for s in self.removed.set() | other.removed.set()}
+        return not self.guard.may_intersect(other.guard, lower)
+
+    def applications(self, multiset: Multiset[str]) -> int:
+        """
+        Number of consecutive times the rule can be applied to multiset
+        """
+        limit = min((multiset.count(s) // c for s, c in self.removed.map.items() if c > 0), default=0)
+        return self.guard.run_length(multiset.map, self.removed.map, limit)
 
     def dot(self):
         regex = self.regex_str
@@ -66,6 +103,24 @@ class Rule:
             return f'{self.removed.dot()} → {synapses}{block}'
 
 
+@dataclass
+class Periodic:
+    """
+    Result of a run stopped because a configuration reached without random choices repeated,
+    so the computation repeats forever from step start with the given period.
+    """
+    start: int
+    period: int
+    output: typing.Any = None
+
+    def __str__(self) -> str:
+        return f'periodic, period {self.period} starting at step {self.start}'
+
+
+def synapses() -> Dict[T, Set[T]]:
+    return defaultdict(set)
+
+
 def register_membrane(*indexes):
     def decorator(f):
         def wrapper(self: SNPSystem, *args, **kwargs):
@@ -84,33 +139,67 @@ class SNPSystem(Generic[T, U]):
     U: Chanel id type
     """
 
-    def __init__(self) -> None:
+    def __init__(self, rule_cache_size: int = 4096) -> None:
         self._input: T = None
         self._output: T = None
         self._ms: Dict[T, Multiset[chr]] = defaultdict(Multiset)
-        self._channels: Dict[U, Dict[T, Set[T]]] = defaultdict(lambda: defaultdict(set))
+        self._channels: Dict[U, Dict[T, Set[T]]] = defaultdict(synapses)
         self._rules: Dict[int, List[Rule]] = defaultdict(list)
+        # Rules to choose from for each (neuron, content) pair, so repeated configurations skip the regex evaluation
+        self._rule_cache: LRUCache[Tuple[T, FrozenSet[Tuple[str, int]]], List[Rule]] = LRUCache(rule_cache_size)
+        # Neurons where two rules may be applicable at once, filled by finalize. The rest fire without random choices
+        self._ambiguous: Set[T] = set()
 
         self._state: Dict[T, Multiset[chr]] = {}
-        self._delay: Dict[T, List[int, Optional[Rule]]] = {}
-        self._next_state: Dict[T, Multiset[chr]] = {}
-
-        self._history: List[Dict[str, Multiset]] = []
-
-    def render(self, path, current_state: bool = False, name: str = 'SNP-System', comment: str = ''):
+        # Initial contents frozen by finalize, shared by every run
+        self._initial: Dict[T, FrozenMultiset[chr]] = {}
+        # Timer wheel of the blocked neurons: the step at which the pending rule of each neuron fires, and the
+        # neurons due at each step, so a blocked neuron is not examined again until its rule fires
+        self._pending: Dict[T, Tuple[int, Rule]] = {}
+        self._wheel: Dict[int, List[T]] = defaultdict(list)
+        self._clock: int = 0
+        # Spikes sent during the current step, merged into _state only for the neurons that received them
+        self._incoming: Dict[T, Multiset[chr]] = defaultdict(Multiset)
+        # Neurons to examine in the next step, those that received spikes.
+        # A neuron that only lost spikes ends its step with no applicable rule, so it stays quiet.
+        self._active: Set[T] = set()
+        self._order: Dict[T, int] = {}
+        self._finalized: bool = False
+        self._digest: Optional[str] = None
+
+        # Receives the spikes sent to the output neuron, keeping only what the mode of the run needs
+        self._history: History[U] = History()
+        # Number of choices made among several rules, a configuration only proves a cycle if none happened since
+        self._choice_points: int = 0
+        # Content, delay and pending rule of each neuron, whose hashes are combined with xor into the configuration hash
+        self._keys: Dict[T, tuple] = {}
+        self._hash: int = 0
+        self._sink_output: bool = False
+        # Source of the nondeterministic choices, the global random module unless the run is seeded
+        self._random: typing.Union[random.Random, typing.Any] = random
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        if state['_random'] is random:
+            state['_random'] = None
+        return state
+
+    def graph(self, contents: Dict[T, Multiset[str]], name: str = 'SNP-System', comment: str = '') -> GraphRenderer:
         gr = GraphRenderer(name, comment=comment)
 
         for node in self._ms.keys():
             rules = '<BR/>'.join(map(lambda x: x.dot(), self._rules[node]))
-            content = self._ms[node] if not current_state else self._state[node]
-            gr.add_node(str(node), f'<{content.dot()}<BR/>{rules}>', final=(node == self._output), initial=(node == self._input))
+            gr.add_node(str(node), f'<{contents[node].dot()}<BR/>{rules}>', final=(node == self._output), initial=(node == self._input))
 
         for channel, content in self._channels.items():
             for start, ends in content.items():
                 for end in ends:
                     gr.add_edge(str(start), str(end), f'{channel}')
 
-        gr.render(path)
+        return gr
+
+    def render(self, path, current_state: bool = False, name: str = 'SNP-System', comment: str = ''):
+        self.graph(self._ms if not current_state else self._state, name, comment).render(path)
 
     @register_membrane(0)
     def set_input(self, inp: T) -> None:
@@ -119,102 +208,412 @@ class SNPSystem(Generic[T, U]):
     @register_membrane(0)
     def set_output(self, out: T) -> None:
         self._output = out
+        self._finalized = False
 
     def add_symbols(self, neuron: T, *symbols: chr) -> None:
         self._ms[neuron].extend(symbols)
+        self._finalized = False
+
+    def add_content(self, neuron: T, content: Multiset[str]) -> None:
+        """
+        Adds the spikes of content by their counts, without enumerating them
+        """
+        self._ms[neuron].extend(content)
+        self._finalized = False
 
     @register_membrane(1, 2)
     def add_channel(self, channel: U, begin: T, end: T) -> None:
         self._channels[channel][begin].add(end)
+        self._finalized = False
 
     @register_membrane(0)
     def add_rule(self, neuron: T, regex: str, removed: Multiset[chr], channels: Dict[U, Multiset[chr]], block: int = 0) -> None:
-        self._rules[neuron].append(Rule(regex, removed, channels, block))
+        with profiler.phase('rules'):
+            self._rules[neuron].append(Rule(regex, removed, channels, block))
+        self._rule_cache.clear()
+        self._finalized = False
+
+    def finalize(self) -> None:
+        """
+        Resolves the synapses of every rule into its emission plan and freezes the initial configuration,
+        runs do it whenever the model changed
+        """
+        self._order = {k: i for i, k in enumerate(self._ms.keys())}
+        self._digest = None
+        self._initial = {k: FrozenMultiset.from_counts(v.map) for k, v in self._ms.items()}
+        for neuron, rules in self._rules.items():
+            for rule in rules:
+                targets = {}
+                outputs = []
+                for channel, sent in rule.channels.items():
+                    ends = self._channels[channel].get(neuron, ())
+                    for target in ends:
+                        targets.setdefault(target, Multiset()).extend(sent)
+                    if self._output in ends:
+                        outputs.append((channel, sent))
+                rule.targets = tuple(targets.items())
+                rule.outputs = tuple(outputs)
+        # Only rules of the same kind compete, forgetting rules are used when no other rule is applicable
+        self._ambiguous = {neuron for neuron, rules in self._rules.items()
+                           if any(a.forgetting == b.forgetting and not a.excludes(b) for a, b in combinations(rules, 2))}
+        self._finalized = True
+
+    def deterministic(self) -> bool:
+        """
+        Whether every run of the model makes the same choices, so that its result does not depend on the seed
+        """
+        if not self._finalized:
+            self.finalize()
+        return not self._ambiguous
+
+    def cache_info(self) -> Dict[str, int]:
+        return self._rule_cache.info()
 
     def _update_state(self):
-        self._state = deepcopy(self._next_state)
-
-    def _valid_rules(self, neuron: T) -> List[Rule]:
-        return [rule for rule in self._rules[neuron] if len(rule.removed - self._state[neuron]) == 0 and rule.valid(self._state[neuron])]
-
-    def _run_rule(self, neuron: T, rule: Rule) -> bool:
-        self._state[neuron] -= rule.removed
-        self._next_state[neuron] -= rule.removed
-        for channel, sent in rule.channels.items():
-            for target in self._channels[channel][neuron]:
-                self._next_state[target].extend(sent)
-                if target == self._output:
-                    self._history[-1][channel].extend(sent)
+        self._active.update(self._incoming.keys())
+        state = self._state
+        for neuron, spikes in self._incoming.items():
+            content = state[neuron]
+            if content.frozen:
+                state[neuron] = content + spikes
+            else:
+                content.extend(spikes)
+        self._incoming = defaultdict(Multiset)
+
+    def _choices(self, neuron: T) -> List[Rule]:
+        key = (neuron, self._state[neuron].signature())
+        rules = self._rule_cache.get(key)
+        if rules is None:
+            valid_rules = [rule for rule in self._rules[neuron] if rule.applicable(self._state[neuron])]
+            rules = [rule for rule in valid_rules if not rule.forgetting] or valid_rules
+            self._rule_cache[key] = rules
+        return rules
+
+    def _run_rule(self, neuron: T, rule: Rule, times: int = 1) -> bool:
+        if times == 1:
+            self._state[neuron] -= rule.removed
+            for target, sent in rule.targets:
+                self._incoming[target].extend(sent)
+            for channel, sent in rule.outputs:
+                self._history.record(channel, sent)
+        else:
+            self._state[neuron] -= rule.removed * times
+            for target, sent in rule.targets:
+                self._incoming[target].extend(sent * times)
+            for channel, sent in rule.outputs:
+                self._history.record(channel, sent * times)
         return True
 
+    def _block(self, neuron: T, rule: Rule, delay: int = 0) -> None:
+        due = self._clock + delay + 1
+        self._pending[neuron] = (due, rule)
+        self._wheel[due].append(neuron)
+
     def _run_neuron(self, neuron: T) -> bool:
         modified = False
 
-        if self._delay[neuron][0] > 0:
-            self._delay[neuron][0] -= 1
-            return True
-        elif self._delay[neuron][0] == 0:
-            self._delay[neuron][0] -= 1
-            modified |= self._run_rule(neuron, self._delay[neuron][1])
-
-        delay = 0
-        while valid_rules := self._valid_rules(neuron):
-            rules = [rule for rule in valid_rules if not rule.forgetting]
-            if len(rules) == 0:
-                rules = valid_rules
-
-            rule = random.choice(rules)
+        if neuron in self._pending:
+            due, rule = self._pending[neuron]
+            if due > self._clock:
+                return False
+            del self._pending[neuron]
+            modified |= self._run_rule(neuron, rule)
+
+        ambiguous = neuron in self._ambiguous
+        while rules := self._choices(neuron):
+            if not ambiguous:
+                rule = rules[0]
+            else:
+                if len(rules) > 1:
+                    self._choice_points += 1
+                rule = self._random.choice(rules)
             if rule.block > 0:
-                self._delay[neuron] = [delay, rule]
+                self._block(neuron, rule)
                 return True
 
-            while len(rule.removed - self._state[neuron]) == 0 and rule.valid(self._state[neuron]):
-                modified |= self._run_rule(neuron, rule)
+            modified |= self._run_rule(neuron, rule, rule.applications(self._state[neuron]))
         return modified
 
-    def run(self, input_data: Multiset[str], render_steps: bool = False, render_name: str = 'SNP-System',
-            render_path: str = '../tmp', mode: str = 'halt', max_steps: Optional[int] = None) -> \
-            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]:
-        self._history = []
-        self._next_state = deepcopy(self._ms)
-        self._delay = {k: [-1, None] for k in self._ms.keys()}
+    def _step(self) -> bool:
+        """
+        Examines the neurons that received spikes and those whose blocked rule is due, returns whether any rule
+        was applied. Blocked neurons keep the computation alive without being examined, see _halted.
+        """
+        self._clock += 1
+        modified = False
+        active, self._active = self._active, set()
+        due = self._wheel.pop(self._clock, None)
+        if due:
+            active.update(due)
+        for neuron in sorted(active, key=self._order.__getitem__):
+            modified |= self._run_neuron(neuron)
+        return modified
+
+    def _halted(self, modified: bool) -> bool:
+        return not modified and not self._wheel
+
+    def _shift(self, steps: int) -> None:
+        """
+        Moves the clock steps ahead, the blocked neurons keep waiting the same number of steps
+        """
+        self._clock += steps
+        self._pending = {n: (due + steps, rule) for n, (due, rule) in self._pending.items()}
+        self._wheel = defaultdict(list)
+        for neuron, (due, _) in self._pending.items():
+            self._wheel[due].append(neuron)
+
+    def _delays(self) -> Dict[T, Tuple[int, Optional[Rule]]]:
+        """
+        Steps each blocked neuron still waits before its rule fires (-1 for the rest), as stored in configurations
+        """
+        return {n: (due - self._clock - 1, rule) for n, (due, rule) in self._pending.items()}
+
+    def _set_delays(self, delays: Dict[T, Tuple[int, int]]) -> None:
+        self._pending = {}
+        self._wheel = defaultdict(list)
+        for neuron, (delay, rule) in delays.items():
+            if delay >= 0 and rule >= 0:
+                self._block(neuron, self._rules[neuron][rule], delay)
+
+    def _start(self, input_data: Multiset[str], seed: Optional[int] = None, history: Optional[History[U]] = None) -> None:
+        if not self._finalized:
+            self.finalize()
+        self._random = random if seed is None else random.Random(seed)
+        self._history = history if history is not None else History()
+        # Neurons share the frozen initial contents until their first change
+        self._state = self._initial.copy()
+        self._incoming = defaultdict(Multiset)
+        self._pending = {}
+        self._wheel = defaultdict(list)
+        self._clock = 0
+        self._active = set(self._order)
         if self._input is not None:
-            self._next_state[self._input].extend(input_data)
-        self._update_state()
-        step = 0
-        if render_steps:
-            self.render(render_path, True, f'{render_name}.0')
+            self._state[self._input] = self._state[self._input] + input_data
+
+    def _fingerprint(self, neurons: typing.Iterable[T], undo: Optional[List[Tuple[T, Optional[tuple]]]] = None) -> int:
+        """
+        Updates the configuration hash with the neurons that changed, appending their previous keys to undo
+        """
+        for neuron in neurons:
+            if neuron == self._output and self._sink_output:
+                continue
+            due, rule = self._pending.get(neuron, (self._clock, None))
+            key = (neuron, self._state[neuron].signature(), due - self._clock - 1, rule)
+            previous = self._keys.get(neuron)
+            if previous == key:
+                continue
+            if previous is not None:
+                self._hash ^= hash(previous)
+            self._hash ^= hash(key)
+            self._keys[neuron] = key
+            if undo is not None:
+                undo.append((neuron, previous))
+        return self._hash
+
+    def _repeats(self, undo: List[List[Tuple[T, Optional[tuple]]]], steps: int) -> bool:
+        """
+        Whether the configuration is the one of steps steps ago, comparing only the neurons changed since then
+        """
+        earlier: Dict[T, Optional[tuple]] = {}
+        for changes in undo[len(undo) - steps:]:
+            for neuron, previous in changes:
+                earlier.setdefault(neuron, previous)
+        return all(self._keys.get(neuron) == key for neuron, key in earlier.items())
+
+    def digest(self) -> str:
+        """
+        Hash of the neurons, rules and synapses of the model, kept until the model changes
+        """
+        if self._finalized and self._digest is not None:
+            return self._digest
+        h = hashlib.sha256(repr((self._input, self._output)).encode())
+        for neuron, content in self._ms.items():
+            # Spikes as sorted positive counts, so equal multisets hash equally whatever their insertion order
+            rules = [(rule.regex_str, sorted(rule.removed.signature()),
+                      sorted((repr(c), sorted(sent.signature())) for c, sent in rule.channels.items()), rule.block)
+                     for rule in self._rules[neuron]]
+            h.update(repr((neuron, sorted(content.signature()), rules)).encode())
+        for channel, content in self._channels.items():
+            # Lookups during a run create empty entries, which are not part of the model
+            synapses = sorted((repr(k), sorted(map(repr, v))) for k, v in content.items() if v)
+            if synapses:
+                h.update(repr((channel, synapses)).encode())
+        if self._finalized:
+            self._digest = h.hexdigest()
+        return h.hexdigest()
+
+    def checkpoint(self, step: int, mode: str = 'halt') -> Checkpoint:
+        return Checkpoint(self.digest(), mode, step, {n: tuple(self._state[n].map.items()) for n in self._order},
+                          {n: (delay, self._rules[n].index(rule)) for n, (delay, rule) in self._delays().items()},
+                          sorted(self._active, key=self._order.__getitem__), deepcopy(self._history),
+                          self._random is not random, self._random.getstate(), self._choice_points)
+
+    def _resume(self, checkpoint: Checkpoint, mode: str, seed: Optional[int] = None,
+                history: Optional[History[U]] = None) -> None:
+        if checkpoint.model != self.digest():
+            raise ValueError('The checkpoint was taken from a different model')
+        if checkpoint.mode != mode and history is None:
+            raise ValueError(f'The checkpoint was taken from a run in {checkpoint.mode} mode')
+        if not self._finalized:
+            self.finalize()
+        self._state = {n: Multiset.from_counts(dict(content)) for n, content in checkpoint.state.items()}
+        self._clock = checkpoint.step
+        self._set_delays(checkpoint.delay)
+        self._incoming = defaultdict(Multiset)
+        self._active = set(checkpoint.active)
+        self._choice_points = checkpoint.choice_points
+        self._history = history if history is not None else checkpoint.history
+        if isinstance(self._history, CallbackHistory):
+            if self._history.callback is None:
+                raise ValueError('The callback of the history must be given again to resume the run')
+            self._history.step = checkpoint.step
+
+        if seed is not None:
+            self._random = random.Random(seed)
+        elif checkpoint.seeded:
+            self._random = random.Random()
+            self._random.setstate(checkpoint.random_state)
+        else:
+            self._random = random
+            random.setstate(checkpoint.random_state)
+
+    def _snapshot(self) -> Configuration:
+        delays = self._delays()
+        return tuple((self._state[n].signature(), delays[n][0], self._rules[n].index(delays[n][1]))
+                     if n in delays else (self._state[n].signature(), -1, -1) for n in self._order)
+
+    def _restore(self, configuration: Configuration) -> None:
+        self._state = {n: Multiset.from_counts(dict(content)) for n, (content, _, _) in zip(self._order, configuration)}
+        self._clock = 0
+        self._set_delays({n: (delay, rule) for n, (_, delay, rule) in zip(self._order, configuration)})
+        self._incoming = defaultdict(Multiset)
+        self._active = set(self._order)
+
+    def _result(self, mode: str) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]]]:
+        if self._output is not None:
+            match mode:
+                case 'halt':
+                    return copy(self._state[self._output])
+                case _:
+                    return self._history.result()
+        return Multiset()
+
+    def run(self, input_data: Multiset[str], render_steps: bool = False, render_name: str = 'SNP-System',
+            render_path: str = '../tmp', mode: str = 'halt', max_steps: Optional[int] = None, seed: Optional[int] = None,
+            detect_cycles: bool = False, history: Optional[History[U]] = None, render_every: int = 1,
+            render_range: Optional[Tuple[int, int]] = None, render_workers: Optional[int] = None,
+            checkpointer: Optional[Checkpointer] = None, resume: Optional[Checkpoint] = None,
+            fast_forward: bool = False, trace: Optional[TraceWriter] = None,
+            results: Optional[ResultCache] = None) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]], Periodic]:
+        """
+        history replaces the recording chosen by mode, e.g. a CallbackHistory to stream the output of long runs.
+        render_every and render_range=(first, last) select the rendered steps, which are rendered in background.
+        resume continues the run saved in a checkpoint (input_data is ignored), with its random state unless a
+        seed is given, so a run can also be forked from a checkpoint with different seeds.
+        fast_forward jumps over the periods of the regimes where the same rules keep firing while the contents grow or
+        shrink linearly, until a rule guard changes its answer.
+        trace records every rule applied during the run, see TraceReader to replay it.
+        results returns the result stored by a previous identical run, or stores this one. Runs that render, stream
+        their history, save or resume checkpoints or are traced are not cached.
+        """
+        if fast_forward and render_steps:
+            raise ValueError('The steps of a fast-forwarded run can not be rendered')
+        if fast_forward and trace is not None:
+            raise ValueError('The steps of a fast-forwarded run can not be traced')
+        key = None
+        if results is not None and not (render_steps or history is not None or checkpointer is not None
+                                        or resume is not None or trace is not None):
+            key = results.key(self, input_data, mode, seed, max_steps=max_steps, detect_cycles=detect_cycles,
+                              fast_forward=fast_forward)
+            res = results.get(key) if key is not None else None
+            if res is not None:
+                return res
+        forward = FastForward(self) if fast_forward else None
+        args = (input_data, mode, max_steps, seed, detect_cycles, history, checkpointer, resume, forward)
+        with profiler.ACTIVE.instrument(self) if profiler.ACTIVE is not None else nullcontext():
+            with forward.recording() if forward is not None else nullcontext(), \
+                    trace.recording(self) if trace is not None else nullcontext():
+                res = self._render_run(args, render_steps, render_name, render_path, render_every, render_range,
+                                       render_workers)
+        if key is not None:
+            results[key] = res
+        return res
+
+    def run_batch(self, inputs: typing.Sequence[Multiset[str]], mode: str = 'halt', max_steps: Optional[int] = None,
+                  seed: Optional[int] = None, **kwargs) -> list:
+        """
+        Runs every input one after another on the same finalized model and rule cache, each one with its own seed
+        derived from seed. Results are returned in the order of inputs.
+        """
+        seeds = derive_seeds(seed, len(inputs)) if seed is not None else [None] * len(inputs)
+        return [self.run(input_data, mode=mode, max_steps=max_steps, seed=run_seed, **kwargs)
+                for input_data, run_seed in zip(inputs, seeds)]
+
+    def _render_run(self, args: tuple, render_steps: bool, render_name: str, render_path: str, render_every: int,
+                    render_range: Optional[Tuple[int, int]], render_workers: Optional[int]) -> typing.Any:
+        if not render_steps:
+            return self._run(*args, None)
+        with RenderPipeline(self, render_path, render_name, render_every, render_range, render_workers) as renderer:
+            return self._run(*args, renderer)
+
+    def _run(self, input_data: Multiset[str], mode: str, max_steps: Optional[int], seed: Optional[int],
+             detect_cycles: bool, history: Optional[History[U]], checkpointer: Optional[Checkpointer],
+             resume: Optional[Checkpoint], forward: Optional[FastForward[T, U]], renderer: Optional[RenderPipeline[T]]) -> \
+            typing.Union[Multiset[str], Dict[str, Multiset[str]], List[Multiset[str]], List[Dict[str, Multiset[str]]], Periodic]:
+        if resume is None:
+            self._start(input_data, seed, history if history is not None else history_for(mode))
+            step = 0
+        else:
+            self._resume(resume, mode, seed, history)
+            step = resume.step
+            if max_steps and step >= max_steps:
+                return self._result(mode)
+        if detect_cycles:
+            # An output neuron without rules only accumulates spikes, its content does not decide the future
+            self._sink_output = not self._rules.get(self._output)
+            self._keys, self._hash = {}, 0
+            # Steps of each configuration hash and the keys changed by each step since the first one
+            seen: Dict[int, List[int]] = {self._fingerprint(self._order): [step]}
+            undo: List[List[Tuple[T, Optional[tuple]]]] = []
+        choice_points = self._choice_points
+        if renderer is not None:
+            renderer.submit(step, self._state)
         while True:
-            self._history.append(defaultdict(Multiset))
+            self._history.begin_step()
             step += 1
-            modified = False
-            for neuron in self._ms.keys():
-                modified |= self._run_neuron(neuron)
-            if not modified:
+            # Blocked neurons are rehashed every step, the steps they still wait are part of the configuration
+            examined = self._active | self._pending.keys()
+            modified = self._step()
+            if self._halted(modified):
                 break
+            changed = examined | self._incoming.keys()
             self._update_state()
-            if render_steps:
-                self.render(render_path, True, f'{render_name}.{step}')
-            if max_steps and step == max_steps:
+            if renderer is not None:
+                renderer.submit(step, self._state)
+            chosen, choice_points = choice_points != self._choice_points, self._choice_points
+            if detect_cycles:
+                if chosen:
+                    seen.clear()
+                    undo.clear()
+                undo.append([])
+                fingerprint = self._fingerprint(changed, undo[-1])
+                for start in seen.get(fingerprint, ()):
+                    if self._repeats(undo, step - start):
+                        return Periodic(start, step - start, self._result(mode))
+                seen.setdefault(fingerprint, []).append(step)
+            if forward is not None:
+                if chosen:
+                    forward.reset()
+                period = forward.end_step()
+                if period is not None:
+                    step += period * forward.jump(period, (max_steps - step) // period if max_steps else None)
+                    if detect_cycles:
+                        seen, undo = {self._fingerprint(self._order): [step]}, []
+            if checkpointer is not None and checkpointer.due(step):
+                checkpointer.save(self.checkpoint(step, mode))
+            if max_steps and step >= max_steps:
                 break
         self._update_state()
-
-        if self._output is not None:
-            match mode:
-                case 'halt':
-                    return self._state[self._output]
-                case 'halt-mc':
-                    res = defaultdict(Multiset)
-                    for item in self._history:
-                        for k, v in item.items():
-                            res[k].extend(v)
-                    return res
-                case 'time':
-                    res = [Multiset() for _ in range(len(self._history))]
-                    for i, item in enumerate(self._history):
-                        for k, v in item.items():
-                            res[i].extend(v)
-                    return res
-                case 'time-mc':
-                    return self._history
-        return Multiset()
+        return self._result(mode)
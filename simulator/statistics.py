@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import math
+import multiprocessing
+import pickle
+import typing
+from collections import Counter
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from simulator import parallel
+from simulator.parallel import Runner, derive_seeds, run_repeated
+from simulator.snpsystem import Periodic
+from utils import Multiset
+
+Result = typing.Any
+
+
+def outcome_key(result: Result) -> Hashable:
+    """
+    Hashable form of the result of a run, equal for equal results whatever the mode
+    """
+    if isinstance(result, Periodic):
+        return 'periodic', result.start, result.period, outcome_key(result.output)
+    if isinstance(result, Multiset):
+        return tuple(sorted((s, c) for s, c in result.map.items() if c > 0))
+    if isinstance(result, dict):
+        # Channels that received nothing are not part of the outcome
+        return tuple(sorted(((repr(k), outcome_key(v)) for k, v in result.items() if len(v) > 0)))
+    if isinstance(result, list):
+        return tuple(map(outcome_key, result))
+    return result
+
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    """
+    Wilson score interval of a binomial proportion, 95% confidence by default
+    """
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class OutcomeHistogram:
+    """
+    Number of runs that gave each distinct result, folded as the runs finish.
+    Histograms of disjoint sets of runs, e.g. from different workers, are merged by adding them.
+    """
+
+    def __init__(self, results: Iterable[Result] = ()) -> None:
+        self.counts: Counter[Hashable] = Counter()
+        # One result of each outcome, to show it
+        self.examples: Dict[Hashable, Result] = {}
+        for result in results:
+            self.add(result)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, result: Result, times: int = 1) -> None:
+        key = outcome_key(result)
+        if key not in self.examples:
+            self.examples[key] = result
+        self.counts[key] += times
+
+    def merge(self, other: OutcomeHistogram) -> None:
+        for key, count in other.counts.items():
+            if key not in self.examples:
+                self.examples[key] = other.examples[key]
+            self.counts[key] += count
+
+    def __iadd__(self, other: OutcomeHistogram) -> OutcomeHistogram:
+        self.merge(other)
+        return self
+
+    def count(self, result: Result) -> int:
+        return self.counts.get(outcome_key(result), 0)
+
+    def frequency(self, result: Result) -> float:
+        total = self.total
+        return self.count(result) / total if total else 0.0
+
+    def interval(self, result: Result, z: float = 1.96) -> Tuple[float, float]:
+        return wilson_interval(self.count(result), self.total, z)
+
+    def outcomes(self, z: float = 1.96) -> Iterator[Tuple[Result, int, float, Tuple[float, float]]]:
+        """
+        Yields every outcome with its count, frequency and confidence interval, most frequent first
+        """
+        total = self.total
+        for key, count in sorted(self.counts.items(), key=lambda x: (-x[1], repr(x[0]))):
+            yield self.examples[key], count, count / total, wilson_interval(count, total, z)
+
+    def __str__(self) -> str:
+        return f'runs: {self.total}, outcomes: {len(self)}'
+
+
+def _aggregate_worker(args: Tuple[Multiset[str], List[int], dict]) -> OutcomeHistogram:
+    input_data, seeds, kwargs = args
+    return OutcomeHistogram(parallel._worker_runner.run(input_data, seed=seed, **kwargs) for seed in seeds)
+
+
+def aggregate_repeated(runner: Runner, input_data: Multiset[str], repeat: int, jobs: int = 1,
+                       seed: Optional[int] = None, **kwargs) -> OutcomeHistogram:
+    """
+    Histogram of the results of repeat runs, with the same runs as run_repeated. With several jobs every worker folds
+    its own runs and only the partial histograms are sent back.
+    """
+    if repeat > 1 and runner.deterministic():
+        histogram = OutcomeHistogram()
+        histogram.add(runner.run(input_data, **kwargs), repeat)
+        return histogram
+    if jobs <= 1:
+        return OutcomeHistogram(run_repeated(runner, input_data, repeat, jobs, seed, **kwargs))
+
+    seeds = derive_seeds(seed, repeat)
+    size = max(1, math.ceil(repeat / (jobs * 4)))
+    tasks = [(input_data, seeds[i:i + size], kwargs) for i in range(0, repeat, size)]
+    histogram = OutcomeHistogram()
+    with multiprocessing.Pool(jobs, initializer=parallel._init_worker, initargs=(pickle.dumps(runner),)) as pool:
+        for partial in pool.imap_unordered(_aggregate_worker, tasks):
+            histogram.merge(partial)
+    return histogram
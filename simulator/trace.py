@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import bisect
+import os
+import pickle
+import struct
+import typing
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterator, List, NamedTuple, Optional, Tuple, TypeVar
+
+from utils import Multiset
+
+T = TypeVar('T')
+
+MAGIC = b'SNPT'
+END_MAGIC = b'SNPE'
+VERSION = 1
+# Step, neuron index, rule index and number of applications, 0 when the rule blocked the neuron
+RECORD = struct.Struct('<IIHQ')
+_HEADER = struct.Struct('<4sHI')
+_FOOTER = struct.Struct('<Q4s')
+
+
+class Event(NamedTuple):
+    step: int
+    neuron: typing.Any
+    rule: int
+    times: int
+
+
+@dataclass
+class RuleEffect:
+    """
+    What a rule does each time it is applied: its text, the spikes it consumes, the spikes sent through each
+    channel and the spikes received by each target neuron index
+    """
+    text: str
+    removed: Dict[str, int]
+    channels: Dict[typing.Any, Dict[str, int]]
+    targets: Tuple[Tuple[int, Dict[str, int]], ...]
+
+
+@dataclass
+class TracedConfiguration(Generic[T]):
+    """
+    Configuration at the end of a step: neuron contents and, for the blocked neurons, the steps they still wait
+    and the index of their pending rule
+    """
+    step: int
+    contents: Dict[T, Multiset[str]]
+    delays: Dict[T, Tuple[int, int]]
+
+
+class TraceWriter:
+    """
+    Records the rules applied during a run as fixed size binary records, buffered in memory.
+    The header holds the neurons, the effect of every rule and the initial configuration, and the footer written by
+    close holds the configuration every keyframe_every steps, so a reader can rebuild any step quickly.
+    """
+
+    def __init__(self, path: str, keyframe_every: int = 1024, buffer_size: int = 1 << 16) -> None:
+        self.path: str = path
+        self.keyframe_every: int = keyframe_every
+        self.buffer_size: int = buffer_size
+        self.events: int = 0
+        self._file = open(path, 'wb')
+        self._buffer = bytearray()
+        self._model = None
+        self._index: Dict[typing.Any, int] = {}
+        self._rule_index: Dict[int, int] = {}
+        # Configurations at some steps, with the number of records written before them
+        self._keyframes: List[Tuple[int, int, Dict[int, Dict[str, int]], Dict[int, Tuple[int, int]]]] = []
+        self._step: int = 0
+
+    def __enter__(self) -> TraceWriter:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @contextmanager
+    def recording(self, model) -> Iterator[None]:
+        """
+        Records the run of model inside the block, a trace holds a single run
+        """
+        if self._model is not None:
+            raise ValueError('A trace records a single run')
+        self._model = model
+        step, update_state, run_rule, block = model._step, model._update_state, model._run_rule, model._block
+        previous = {name: model.__dict__.get(name) for name in ('_step', '_update_state', '_run_rule', '_block')}
+
+        def traced_step():
+            if not self._keyframes:
+                self._start()
+            return step()
+
+        def traced_update_state():
+            update_state()
+            self._step = model._clock
+            if self._step % self.keyframe_every == 0 and self._keyframes[-1][0] != self._step:
+                self._keyframe()
+
+        def traced_run_rule(neuron, rule, times=1):
+            self._record(neuron, rule, times)
+            return run_rule(neuron, rule, times)
+
+        def traced_block(neuron, rule, delay=0):
+            # Delays restored from a checkpoint before the first step are part of the initial configuration
+            if self._keyframes:
+                self._record(neuron, rule, 0)
+            return block(neuron, rule, delay)
+
+        model._step, model._update_state, model._run_rule, model._block = \
+            traced_step, traced_update_state, traced_run_rule, traced_block
+        try:
+            yield
+        finally:
+            for name, method in previous.items():
+                if method is None:
+                    del model.__dict__[name]
+                else:
+                    model.__dict__[name] = method
+
+    def _start(self) -> None:
+        model = self._model
+        neurons = list(model._order)
+        self._index = {n: i for i, n in enumerate(neurons)}
+        rules = []
+        for neuron in neurons:
+            effects = []
+            for i, rule in enumerate(model._rules.get(neuron, ())):
+                self._rule_index[id(rule)] = i
+                effects.append(RuleEffect(str(rule), dict(rule.removed.map),
+                                          {c: dict(sent.map) for c, sent in rule.channels.items()},
+                                          tuple((self._index[t], dict(sent.map)) for t, sent in rule.targets)))
+            rules.append(effects)
+        self._step = model._clock
+        self._keyframe()
+        header = pickle.dumps({'model': model.digest(), 'neurons': neurons, 'rules': rules,
+                               'initial': self._keyframes[0]}, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(header)))
+        self._file.write(header)
+
+    def _keyframe(self) -> None:
+        model = self._model
+        contents = {self._index[n]: {s: c for s, c in content.map.items() if c > 0}
+                    for n, content in model._state.items()}
+        delays = {self._index[n]: (delay, self._rule_index[id(rule)]) for n, (delay, rule) in model._delays().items()}
+        self._keyframes.append((self._step, self.events, contents, delays))
+
+    def _record(self, neuron, rule, times: int) -> None:
+        self._buffer += RECORD.pack(self._model._clock, self._index[neuron], self._rule_index[id(rule)], times)
+        self.events += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.write(self._buffer)
+        self._buffer.clear()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        footer = pickle.dumps({'steps': self._step, 'events': self.events, 'keyframes': self._keyframes},
+                              protocol=pickle.HIGHEST_PROTOCOL)
+        offset = self._file.tell()
+        self._file.write(footer)
+        self._file.write(_FOOTER.pack(offset, END_MAGIC))
+        self._file.close()
+
+
+class TraceReader(Generic[T]):
+    """
+    Reads a trace written by TraceWriter: iterates over its events from any step and rebuilds the configuration at
+    the end of any step from the closest keyframe, without the model. A trace whose run was interrupted before the
+    writer was closed is read up to its last complete record, from its initial configuration.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path: str = path
+        self._file = open(path, 'rb')
+        magic, version, length = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a trace')
+        if version != VERSION:
+            raise ValueError(f'Unsupported trace version {version}')
+        header = pickle.loads(self._file.read(length))
+        self.model: str = header['model']
+        self.neurons: List[T] = header['neurons']
+        self.rules: List[List[RuleEffect]] = header['rules']
+        self._body: int = _HEADER.size + length
+
+        size = os.path.getsize(path)
+        footer = None
+        if size - self._body >= _FOOTER.size:
+            self._file.seek(size - _FOOTER.size)
+            offset, end = _FOOTER.unpack(self._file.read(_FOOTER.size))
+            if end == END_MAGIC:
+                self._file.seek(offset)
+                footer = pickle.loads(self._file.read(size - _FOOTER.size - offset))
+        if footer is not None:
+            self.events: int = footer['events']
+            self.steps: int = footer['steps']
+            self._keyframes = footer['keyframes']
+        else:
+            self.events: int = (size - self._body) // RECORD.size
+            self._keyframes = [header['initial']]
+            self.steps: int = next(self._read(self.events - 1, 1))[0] if self.events else self._keyframes[0][0]
+        self._keyframe_steps: List[int] = [k[0] for k in self._keyframes]
+
+    def __enter__(self) -> TraceReader[T]:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.events
+
+    def _read(self, first: int, count: int) -> Iterator[Tuple[int, int, int, int]]:
+        self._file.seek(self._body + first * RECORD.size)
+        return RECORD.iter_unpack(self._file.read(count * RECORD.size))
+
+    def _first_event(self, step: int) -> int:
+        """
+        Index of the first event of step or a later one
+        """
+        low, high = 0, self.events
+        while low < high:
+            middle = (low + high) // 2
+            if next(self._read(middle, 1))[0] < step:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _records(self, first: int, last: int, chunk: int = 4096) -> Iterator[Tuple[int, int, int, int]]:
+        for start in range(first, last, chunk):
+            yield from self._read(start, min(chunk, last - start))
+
+    def events_between(self, first_step: int = 0, last_step: Optional[int] = None) -> Iterator[Event]:
+        """
+        Events of the steps from first_step to last_step, both included
+        """
+        first = self._first_event(first_step)
+        last = self.events if last_step is None else self._first_event(last_step + 1)
+        for step, neuron, rule, times in self._records(first, last):
+            yield Event(step, self.neurons[neuron], rule, times)
+
+    def rule(self, event: Event) -> RuleEffect:
+        return self.rules[self.neurons.index(event.neuron)][event.rule]
+
+    def configuration(self, step: int) -> TracedConfiguration[T]:
+        """
+        Configuration at the end of step, the initial one for the step the run started at
+        """
+        if not self._keyframe_steps[0] <= step <= self.steps:
+            raise ValueError(f'The trace covers the steps {self._keyframe_steps[0]} to {self.steps}')
+        return next(self.replay(step, step))
+
+    def replay(self, first_step: Optional[int] = None, last_step: Optional[int] = None) -> \
+            Iterator[TracedConfiguration[T]]:
+        """
+        Configurations at the end of every step from first_step to last_step, updated event by event
+        """
+        first_step = self._keyframe_steps[0] if first_step is None else first_step
+        last_step = self.steps if last_step is None else min(last_step, self.steps)
+        if first_step < self._keyframe_steps[0]:
+            raise ValueError(f'The trace starts at step {self._keyframe_steps[0]}')
+        start, index, contents, delays = self._keyframes[bisect.bisect_right(self._keyframe_steps, first_step) - 1]
+        counts = {n: dict(c) for n, c in contents.items()}
+        # Step at which the pending rule of each blocked neuron fires
+        due = {n: (start + delay + 1, rule) for n, (delay, rule) in delays.items()}
+        # Spikes sent during step + 1, received at its end
+        incoming: Dict[int, Dict[str, int]] = {}
+        step = start
+        if first_step == start:
+            yield self._configuration(step, counts, due)
+
+        for event_step, neuron, rule, times in self._records(index, self._first_event(last_step + 1)):
+            while step + 1 < event_step:
+                step = self._end_step(step, counts, incoming)
+                if step >= first_step:
+                    yield self._configuration(step, counts, due)
+            if times == 0:
+                due[neuron] = (event_step + 1, rule)
+                continue
+            if neuron in due and due[neuron][0] <= event_step:
+                del due[neuron]
+            effect = self.rules[neuron][rule]
+            content = counts.setdefault(neuron, {})
+            for symbol, count in effect.removed.items():
+                content[symbol] = max(content.get(symbol, 0) - count * times, 0)
+            for target, sent in effect.targets:
+                received = incoming.setdefault(target, {})
+                for symbol, count in sent.items():
+                    received[symbol] = received.get(symbol, 0) + count * times
+        while step < last_step:
+            step = self._end_step(step, counts, incoming)
+            if step >= first_step:
+                yield self._configuration(step, counts, due)
+
+    @staticmethod
+    def _end_step(step: int, counts: Dict[int, Dict[str, int]], incoming: Dict[int, Dict[str, int]]) -> int:
+        for neuron, received in incoming.items():
+            content = counts.setdefault(neuron, {})
+            for symbol, count in received.items():
+                content[symbol] = content.get(symbol, 0) + count
+        incoming.clear()
+        return step + 1
+
+    def _configuration(self, step: int, counts: Dict[int, Dict[str, int]],
+                       due: Dict[int, Tuple[int, int]]) -> TracedConfiguration[T]:
+        return TracedConfiguration(step, {n: Multiset.from_counts(counts.get(i, {})) for i, n in enumerate(self.neurons)},
+                                   {self.neurons[n]: (d - step - 1, rule) for n, (d, rule) in due.items() if d > step})
@@ -2,3 +2,17 @@ from .testDFA import *
 from .testScanner import *
 from .testParser import *
 from .testInterpreter import *
+from .testParikh import *
+from .testMatrixEngine import *
+from .testSNPSystem import *
+from .testParallel import *
+from .testExplorer import *
+from .testRendering import *
+from .testCheckpoint import *
+from .testProfiler import *
+from .testBenchmarks import *
+from .testDiskCache import *
+from .testPartition import *
+from .testStatistics import *
+from .testTrace import *
+from .testResults import *
@@ -0,0 +1,35 @@
+from typing import List, Optional, Union
+
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+
+def coin(sides: str = 'ht', regex: Optional[Union[str, List[str]]] = None) -> SNPSystem:
+    """
+    Neuron that sends one of the symbols of sides to the output for each spike 'a' its rules consume, deterministic
+    with a single side
+    """
+    model = SNPSystem()
+    model.set_input(0)
+    model.set_output('out')
+    model.add_channel(0, 0, 'out')
+    for side in sides:
+        model.add_rule(0, regex, Multiset(['a']), {0: Multiset([side])})
+    return model
+
+
+def choice_ring() -> SNPSystem:
+    """
+    Ring of three neurons where the second one chooses between passing the spike on and delaying it
+    """
+    model = SNPSystem()
+    model.set_input(0)
+    model.set_output('out')
+    for i in range(3):
+        model.add_channel(0, i, (i + 1) % 3)
+    model.add_channel(1, 2, 'out')
+    model.add_rule(0, ['a', '+'], Multiset(['a']), {0: Multiset(['a'])})
+    model.add_rule(1, ['a', '+'], Multiset(['a']), {0: Multiset(['a'])})
+    model.add_rule(1, ['a', '+'], Multiset(['a']), {0: Multiset(['a'])}, 1)
+    model.add_rule(2, ['a', '+'], Multiset(['a']), {0: Multiset(['a']), 1: Multiset(['b'])})
+    return model
@@ -0,0 +1,32 @@
+import unittest
+
+from benchmarks import generators
+from benchmarks.suite import Benchmark, compare, measure
+from utils import Multiset
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_generators(self):
+        """
+        Test that the generated systems behave as described
+        """
+        self.assertEqual(generators.chain(4).run(Multiset(['a'] * 3)), Multiset(['a'] * 3))
+        self.assertListEqual(generators.ring(3).run(Multiset(), mode='time', max_steps=6),
+                             [Multiset(), Multiset(), Multiset(['b']), Multiset(), Multiset(), Multiset(['b'])])
+        self.assertEqual(generators.register_modules(3, 5).run(Multiset(['a'])), Multiset(['1'] * 5 + ['a']))
+        self.assertEqual(generators.fanout(3, 2).run(Multiset(), mode='halt-mc', max_steps=4)[0], Multiset(['a'] * 2))
+        self.assertEqual(generators.many_rules(2, 3).run(Multiset(), max_steps=50), Multiset())
+        self.assertEqual(len(generators.large_spikes(2).run(Multiset.from_counts({'a': 10 ** 9}), mode='time',
+                                                           max_steps=10)), 10)
+
+    def test_measure(self):
+        """
+        Test the measures of a benchmark run and the comparison against a baseline
+        """
+        result = measure(Benchmark('chain', generators.chain, lambda scale: Multiset(['a'] * 2)), scale=5, repeat=1)
+        self.assertEqual(result.steps, 6)
+        self.assertEqual(result.spikes, 10)
+        self.assertGreater(result.peak_memory, 0)
+        self.assertListEqual(compare({'chain': result}, {'chain': {'steps_per_second': result.steps_per_second * 2}}, 0.1),
+                             ['chain'])
+        self.assertListEqual(compare({'chain': result}, {'chain': {'steps_per_second': result.steps_per_second}}, 0.1), [])
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.generators import ring
+from simulator.checkpoint import Checkpoint, Checkpointer
+from simulator.snpsystem import Periodic, SNPSystem
+from tests.models import choice_ring
+from utils import Multiset
+
+
+class TestCheckpoint(unittest.TestCase):
+    def test_resume(self):
+        """
+        Test that resuming from any checkpoint gives the same result as the uninterrupted run
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.ck')
+            model = choice_ring()
+            expected = model.run(Multiset(['a']), mode='time-mc', max_steps=40, seed=7)
+            checkpoints = []
+            checkpointer = Checkpointer(path, steps=9)
+            checkpointer.save = lambda checkpoint: checkpoints.append(checkpoint) or Checkpointer.save(checkpointer, checkpoint)
+            self.assertEqual(model.run(Multiset(['a']), mode='time-mc', max_steps=40, seed=7, checkpointer=checkpointer),
+                             expected)
+            self.assertListEqual([c.step for c in checkpoints], [9, 18, 27, 36])
+            self.assertEqual(Checkpoint.load(path).step, 36)
+
+            for checkpoint in checkpoints:
+                resumed = choice_ring().run(Multiset(), mode='time-mc', max_steps=40,
+                                           resume=Checkpoint.load(path) if checkpoint.step == 36 else checkpoint)
+                self.assertListEqual(resumed, expected)
+
+    def test_fork(self):
+        """
+        Test that runs forked from a checkpoint with different seeds diverge and that checkpoints of other models or
+        modes are rejected
+        """
+        model = choice_ring()
+        model.run(Multiset(['a']), mode='time', max_steps=10, seed=1)
+        checkpoint = model.checkpoint(10, 'time')
+        forks = {str(choice_ring().run(Multiset(), mode='time', max_steps=30, resume=checkpoint, seed=seed))
+                 for seed in range(10)}
+        self.assertGreater(len(forks), 1)
+
+        other = choice_ring()
+        other.add_rule(0, None, Multiset(['b']), {})
+        self.assertRaises(ValueError, other.run, Multiset(), mode='time', resume=checkpoint)
+        self.assertRaises(ValueError, model.run, Multiset(), mode='halt', resume=checkpoint)
+
+    def test_resume_cycles(self):
+        """
+        Test that a resumed run detects cycles from the step of its checkpoint
+        """
+        model = ring(3)
+        model.run(Multiset(), max_steps=7)
+        res = ring(3).run(Multiset(), detect_cycles=True, resume=model.checkpoint(7))
+        self.assertIsInstance(res, Periodic)
+        self.assertEqual((res.start, res.period), (7, 3))
+
+    def test_resume_fast_forward(self):
+        """
+        Test that a run resumed while a neuron waits for its delayed rule can be fast-forwarded
+        """
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        model.add_channel(0, 0, 1)
+        model.add_channel(0, 1, 0)
+        model.add_channel(1, 1, 'out')
+        model.add_rule(0, ['a', '1', '+'], Multiset(['a', '1']), {0: Multiset(['a'])}, 2)
+        model.add_rule(0, None, Multiset(['a']), {})
+        model.add_rule(1, None, Multiset(['a']), {0: Multiset(['a']), 1: Multiset(['t'])})
+        for mode in ['halt-mc', 'time']:
+            model.run(Multiset.from_counts({'a': 1, '1': 30}), mode=mode, max_steps=1)
+            checkpoint = model.checkpoint(1, mode)
+            self.assertEqual(checkpoint.delay, {0: (0, 0)})
+            self.assertEqual(model.run(Multiset(), mode=mode, resume=checkpoint, fast_forward=True),
+                             model.run(Multiset(), mode=mode, resume=checkpoint))
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from interpreter.interpreter import Interpreter
+from interpreter.parser import Parser
+from interpreter.scanner import Scanner
+from utils import DiskCache, Multiset
+
+
+class TestDiskCache(unittest.TestCase):
+    def test_store(self):
+        """
+        Test that stored values are found by their key and corrupted files count as misses
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(os.path.join(directory, 'cache'))
+            key = DiskCache.key('0.1', 'source')
+            self.assertNotEqual(key, DiskCache.key('0.1s', 'ource'))
+            self.assertIsNone(cache.get(key))
+            cache[key] = {'a': 1}
+            self.assertIn(key, cache)
+            self.assertEqual(DiskCache(cache.path).get(key), {'a': 1})
+
+            with open(cache._file(key), 'wb') as f:
+                f.write(b'\x80')
+            self.assertEqual(cache.get(key, 0), 0)
+            self.assertEqual((cache.hits, cache.misses), (0, 2))
+            cache.clear()
+            self.assertNotIn(key, cache)
+            self.assertListEqual(os.listdir(cache.path), [])
+
+    def test_compiled_model(self):
+        """
+        Test that a model loaded from the cache runs like the freshly compiled one
+        """
+        src = '''
+        input([0])
+
+        <0> [1] --> [0]
+        <1> [0] --> [1]
+        <2> [1] --> out
+        <2> [0] --> out
+
+        [0] 'a' 'a'+ / {'a'} --> {'a'} <1>
+        [0] {'a'} --> {'1'} <2>
+        [0] {'a'} --> {'a'} <1>
+
+        [1] 'a' 'a'+ / {'a'} --> {'a'} <0>
+        [1] {'a'} --> {'1'} <2>
+        '''
+        model = Interpreter(Parser(Scanner(src).scan()).parse()).run()
+        model.finalize()
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory)
+            cache['model'] = model
+            loaded = cache.get('model')
+        inp = Multiset(['a'] * 6)
+        self.assertEqual(loaded.digest(), model.digest())
+        self.assertListEqual(loaded.run(inp, mode='time', max_steps=30, seed=5),
+                             model.run(inp, mode='time', max_steps=30, seed=5))
+
+    def test_eviction(self):
+        """
+        Test that the least recently used entries are removed when the entries take more than max_bytes
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, max_bytes=3000)
+            for i in range(3):
+                cache[str(i)] = bytes(900)
+                os.utime(cache._file(str(i)), ns=(i * 10 ** 9, i * 10 ** 9))
+            self.assertIsNotNone(cache.get('0'))
+            cache['3'] = bytes(900)
+            self.assertEqual(cache.evictions, 1)
+            self.assertNotIn('1', cache)
+            for key in ('0', '2', '3'):
+                self.assertIn(key, cache)
+            self.assertLessEqual(sum(os.path.getsize(cache._file(k)) for k in ('0', '2', '3')), 3000)
+
+            # Overwriting an entry replaces its size
+            cache = DiskCache(directory, max_bytes=10 ** 6)
+            for _ in range(3):
+                cache['3'] = bytes(900)
+                self.assertEqual(cache._size, sum(os.path.getsize(cache._file(k)) for k in ('0', '2', '3')))
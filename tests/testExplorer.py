@@ -0,0 +1,59 @@
+import unittest
+
+from simulator.explorer import Explorer
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+
+class TestExplorer(unittest.TestCase):
+    @staticmethod
+    def _branches(size: int) -> SNPSystem:
+        # Neurons 1 and 2 receive a spike each and send one of size symbols to the output
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        model.add_channel(0, 0, 1)
+        model.add_channel(0, 0, 2)
+        model.add_rule(0, 'a+', Multiset(['a']), {0: Multiset(['a'])})
+        for neuron in (1, 2):
+            model.add_channel(0, neuron, 'out')
+            for i in range(size):
+                model.add_rule(neuron, None, Multiset(['a']), {0: Multiset([str(i)])})
+        return model
+
+    def test_outputs(self):
+        """
+        Test that every reachable halting output is found, without repeating equal configurations
+        """
+        explorer = Explorer(self._branches(3))
+        outputs = explorer.explore(Multiset(['a']))
+        self.assertSetEqual({str(sorted(output.map.items())) for output in outputs},
+                            {str(sorted(Multiset([str(i), str(j)]).map.items())) for i in range(3) for j in range(3)})
+        self.assertEqual(explorer.stats.states, 1 + 1 + 6)
+        self.assertFalse(explorer.stats.truncated)
+
+    def test_channels(self):
+        """
+        Test that halt-mc outputs are told apart by the spikes sent through each channel
+        """
+        model = self._branches(2)
+        model.add_channel(1, 2, 'out')
+        model._rules[2][1].channels = {1: Multiset(['1'])}
+        outputs = Explorer(model, 'halt-mc').explore(Multiset(['a']))
+        self.assertSetEqual({str(sorted((k, sorted(v.map.items())) for k, v in output.items())) for output in outputs},
+                            {str([(0, [('0', 2)])]), str([(0, [('1', 1)]), (1, [('1', 1)])]),
+                             str([(0, [('0', 1)]), (1, [('1', 1)])]), str([(0, [('0', 1), ('1', 1)])])})
+
+    def test_limits(self):
+        """
+        Test that the exploration stops at the depth and state limits and rejects modes that can not be explored
+        """
+        explorer = Explorer(self._branches(3), max_depth=2)
+        self.assertListEqual(explorer.explore(Multiset(['a'])), [])
+        self.assertTrue(explorer.stats.truncated)
+
+        explorer = Explorer(self._branches(3), max_states=4)
+        explorer.explore(Multiset(['a']))
+        self.assertEqual(explorer.stats.states, 4)
+        self.assertTrue(explorer.stats.truncated)
+        self.assertRaises(ValueError, Explorer, self._branches(1), 'time')
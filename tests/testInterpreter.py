@@ -83,3 +83,23 @@ class TestInterpreter(unittest.TestCase):
         [5] {'a'} --> {'a'} <4>
         '''
         self._test_output(src, 'halt', Multiset(['1'] * 2), Multiset(['a']))
+
+    def test_large_counts(self):
+        """
+        Test that huge spike counts are handled by their counts instead of one spike at a time
+        """
+        src = '''
+        input([0])
+
+        [1] = {'1'} * 1000000000
+        [1] = [1] + {'b'} * 3
+
+        <0> [0] --> [1]
+        <1> [1] --> out
+
+        [0] '1'+ / {'1'} --> {'1'} <0>
+        [1] '1'+ 'b'* / {'1'} --> {'a'} <1>
+        '''
+        self._test_output(src, 'halt', Multiset.from_counts({'a': 2000000000}),
+                          Multiset.from_counts({'1': 1000000000}))
+        self.assertEqual(Multiset(['a']).union(Multiset.from_counts({'a': 10 ** 12})).count('a'), 10 ** 12)
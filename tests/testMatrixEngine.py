@@ -0,0 +1,131 @@
+import unittest
+from typing import Optional
+
+from interpreter.interpreter import Interpreter
+from interpreter.scanner import Scanner
+from interpreter.parser import Parser
+from simulator.matrixengine import MatrixEngine
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+
+class TestMatrixEngine(unittest.TestCase):
+    @staticmethod
+    def _model(src: str) -> SNPSystem:
+        tokens = Scanner(src).scan()
+        parsed = Parser(tokens).parse()
+        return Interpreter(parsed).run()
+
+    def _test_same_output(self, src: str, input_data: Optional[Multiset[str]] = None, max_steps: Optional[int] = None):
+        """
+        Test if the matrix engine returns the same output as the model for a deterministic source code
+        """
+        input_data = input_data if input_data else Multiset()
+        model = self._model(src)
+        engine = MatrixEngine(self._model(src))
+        for mode in ['halt', 'halt-mc', 'time', 'time-mc']:
+            expected = model.run(input_data, mode=mode, max_steps=max_steps)
+            res = engine.run(input_data, mode=mode, max_steps=max_steps)
+            match mode:
+                case 'halt':
+                    self.assertEqual(res, expected)
+                case 'halt-mc':
+                    self.assertDictEqual(res, expected)
+                case 'time':
+                    self.assertListEqual(res, expected)
+                case 'time-mc':
+                    self.assertEqual(len(res), len(expected))
+                    for a, b in zip(res, expected):
+                        self.assertDictEqual(a, b)
+
+    def test_deterministic(self):
+        """
+        Test some deterministic source codes
+        """
+        src = '''
+        input([0])
+
+        <1> [0] --> out
+        <2> [0] --> [2]
+
+        [0] {'a'} --> {'1'} <1>, {'a'} <2>
+        '''
+        self._test_same_output(src, Multiset(['a']))
+
+        src = '''
+        input([0])
+
+        <0> [1] --> [0]
+        <1> [0] --> [1]
+        <2> [1] --> out
+        <2> [0] --> out
+
+        [0] 'a' 'a'+ / {'a'} --> {'a'} <1>
+        [0] {'a'} --> {'1'} <2>
+
+        [1] 'a' 'a'+ / {'a'} --> {'a'} <0>
+        [1] {'a'} --> {'1'} <2>
+        '''
+        self._test_same_output(src, Multiset(['a'] * 10))
+
+        src = '''
+        input([0])
+
+        [1] = {'1'} * 4
+
+        <1> [0] --> [1]
+        <2> [1] --> out
+        <3> [1] --> [2]
+
+        [0] {'a'} --> {'h'} <1> : 1
+        [1] 'h' '1'+ / {'1'} --> {'1'} <2>
+        [1] {'h'} --> {'h'} <3>
+        [2] {'h'} --> lambda
+        '''
+        self._test_same_output(src, Multiset(['a']))
+
+    def test_nondeterministic(self):
+        """
+        Test that the matrix engine only reaches outputs of the model
+        """
+        src = '''
+        input([0])
+
+        <1> [0] --> out
+        <2> [0] --> out
+
+        [0] {'a'} --> {'1'} <1>
+        [0] {'a'} --> {'2'} <2>
+        '''
+        engine = MatrixEngine(self._model(src))
+        outputs = {str(engine.run(Multiset(['a']), seed=seed)) for seed in range(20)}
+        self.assertSetEqual(outputs, {'(1 * 1)', '(2 * 1)'})
+
+    def test_batch(self):
+        """
+        Test that a batch returns the result of each input in order, even when the runs halt at different steps
+        """
+        src = '''
+        input([0])
+
+        <0> [1] --> [0]
+        <1> [0] --> [1]
+        <2> [1] --> out
+        <2> [0] --> out
+
+        [0] 'a' 'a'+ / {'a'} --> {'a'} <1>
+        [0] {'a'} --> {'1'} <2>
+
+        [1] 'a' 'a'+ / {'a'} --> {'a'} <0>
+        [1] {'a'} --> {'1'} <2>
+        '''
+        model = self._model(src)
+        engine = MatrixEngine(self._model(src))
+        inputs = [Multiset(['a'] * n) for n in (10, 1, 0, 4, 7)]
+        for mode in ['halt', 'time']:
+            expected = [model.run(input_data, mode=mode) for input_data in inputs]
+            self.assertListEqual(engine.run_batch(inputs, mode=mode), expected)
+            self.assertListEqual(model.run_batch(inputs, mode=mode), expected)
+        self.assertListEqual(engine.run_batch(inputs, mode='time', max_steps=2),
+                             [model.run(input_data, mode='time', max_steps=2) for input_data in inputs])
+        self.assertListEqual(engine.run_batch([]), [])
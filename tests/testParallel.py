@@ -0,0 +1,36 @@
+import pickle
+import unittest
+
+from simulator.parallel import run_repeated
+from tests.models import coin
+from utils import Multiset
+
+
+class TestParallel(unittest.TestCase):
+    def test_pickle(self):
+        """
+        Test that a model can be sent to other processes
+        """
+        model = pickle.loads(pickle.dumps(coin()))
+        self.assertIn(model.run(Multiset(['a'])), [Multiset(['h']), Multiset(['t'])])
+
+    def test_reproducible(self):
+        """
+        Test that a batch of runs only depends on the master seed, not on the number of jobs
+        """
+        model = coin()
+        serial = list(run_repeated(model, Multiset(['a']), 20, seed=3))
+        self.assertListEqual(list(run_repeated(model, Multiset(['a']), 20, seed=3)), serial)
+        self.assertListEqual(list(run_repeated(model, Multiset(['a']), 20, jobs=2, seed=3)), serial)
+        self.assertEqual(len(set(map(str, serial))), 2)
+
+    def test_deterministic(self):
+        """
+        Test that a deterministic model runs once however many repetitions are asked
+        """
+        model = coin('h')
+        runs = []
+        run = model.run
+        model.run = lambda *args, **kwargs: runs.append(args) or run(*args, **kwargs)
+        self.assertListEqual(list(run_repeated(model, Multiset(['a']), 5, seed=3)), [Multiset(['h'])] * 5)
+        self.assertEqual(len(runs), 1)
@@ -0,0 +1,58 @@
+import math
+import unittest
+from itertools import product
+from typing import List, Union
+
+from automatons import DFA, SemilinearSet
+from utils import Multiset
+
+
+class TestParikh(unittest.TestCase):
+    def _test_equivalent(self, regex: Union[str, List[str]], max_count: int = 4) -> None:
+        """
+        Test if the Parikh image of regex accepts the same multisets as its automaton
+        """
+        automaton = DFA.from_RegEx(regex)
+        image = SemilinearSet.from_RegEx(regex)
+        symbols = sorted(set(image.alphabet) | {'z'})
+        for counts in product(range(max_count), repeat=len(symbols)):
+            multiset = Multiset.from_counts(dict(zip(symbols, counts)))
+            self.assertEqual(automaton.accepts_multiset(multiset), image.accepts_multiset(multiset), f'{regex} {multiset}')
+
+    def test_multiset_acceptation(self):
+        """
+        Test the Parikh image acceptation against the automaton one
+        """
+        self._test_equivalent('a*b*')
+        self._test_equivalent('ab')
+        self._test_equivalent('a+b')
+        self._test_equivalent(['1', '*', 'a'])
+        self._test_equivalent(['h', '1', '+'])
+        self._test_equivalent(['(', '1', '-1', ')', '*', '1', '*', 'a'], 3)
+
+    def test_run_length(self):
+        """
+        Test the number of times a multiset can be reduced while staying inside the image
+        """
+        image = SemilinearSet.from_RegEx(['1', '*', 'a'])
+        self.assertEqual(image.run_length({'1': 10, 'a': 1}, {'1': 1}, 10), 10)
+        self.assertEqual(image.run_length({'1': 10, 'a': 1}, {'a': 1}, 1), 1)
+        self.assertEqual(image.run_length({'1': 10, 'a': 2}, {'1': 1}, 10), 0)
+
+        image = SemilinearSet.from_RegEx(['a', 'a', '+'])
+        self.assertEqual(image.run_length({'a': 10}, {'a': 1}, 10), 9)
+
+        image = SemilinearSet.from_RegEx(['(', '1', '-1', ')', '*', '1', '*', 'a'])
+        self.assertEqual(image.run_length({'1': 5, '-1': 3, 'a': 1}, {'1': 1, '-1': 1}, 3), 3)
+        self.assertEqual(image.run_length({'1': 5, '-1': 3, 'a': 1}, {'1': 1}, 5), 3)
+
+    def test_line(self):
+        """
+        Test the points of a line that stay inside the image
+        """
+        image = SemilinearSet.from_RegEx(['a', '1', '+'])
+        self.assertListEqual(image.line({'a': 1, '1': 10}, {'1': -1}, {'a': 1, '1': 1}), [(0, 9)])
+        self.assertListEqual(image.line({'a': 1, '1': 10}, {'1': -1, 'b': 1}, {}), [(0, 0)])
+        self.assertListEqual(image.line({'a': 2}, {'a': -1, '1': 2}, {}), [(1, 1)])
+        self.assertListEqual(SemilinearSet.universe().line({'a': 1}, {'a': 3}, {'a': 5}), [(2, math.inf)])
+        self.assertIsNone(SemilinearSet.from_RegEx(['(', 'a', 'a', ')', '+']).line({'a': 2}, {'a': 1}, {}))
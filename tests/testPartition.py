@@ -0,0 +1,55 @@
+import unittest
+
+from benchmarks.generators import chain, register_modules
+from simulator.partition import PartitionedEngine, cut, partition
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+
+class TestPartition(unittest.TestCase):
+    @staticmethod
+    def _delayed() -> SNPSystem:
+        """
+        Two chains crossing each other, with a delayed rule and spikes sent to the output from both of them
+        """
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        for i in range(6):
+            model.add_channel(0, i, i + 1 if i < 5 else 'out')
+            model.add_channel(1, i, 5 - i)
+        model.add_channel(2, 2, 'out')
+        for i in range(6):
+            channels = {0: Multiset(['a']), 1: Multiset(['b'])}
+            if i == 2:
+                channels[2] = Multiset(['c'])
+            model.add_rule(i, ['a', '+'], Multiset(['a']), channels, 1 if i == 3 else 0)
+            model.add_rule(i, ['b', 'b', '+'], Multiset(['b', 'b']), {0: Multiset(['a'])})
+            model.add_rule(i, None, Multiset(['b']), {})
+        return model
+
+    def test_partition(self):
+        """
+        Test that the parts are balanced and a chain is only cut between consecutive parts
+        """
+        model = chain(100)
+        assignment = partition(model, 4)
+        self.assertEqual(cut(model, assignment), 3)
+        self.assertLessEqual(max(list(assignment.values()).count(p) for p in range(4)), 26)
+
+        model = register_modules(10, 3)
+        self.assertLess(cut(model, partition(model, 3)), cut(model, {n: i % 3 for i, n in enumerate(model._ms)}))
+        self.assertRaises(ValueError, PartitionedEngine, model, 0)
+
+    def test_sequential_results(self):
+        """
+        Test that a deterministic model gives the same results as the sequential engine
+        """
+        model = self._delayed()
+        self.assertTrue(model.deterministic())
+        with PartitionedEngine(model, 3) as engine:
+            for inp in (Multiset(['a']), Multiset(['a', 'a', 'a', 'b', 'b'])):
+                for mode in ('halt', 'halt-mc', 'time', 'time-mc'):
+                    self.assertEqual(engine.run(inp, mode=mode, max_steps=40), model.run(inp, mode=mode, max_steps=40))
+            self.assertListEqual(engine.run_batch([Multiset(['a'])] * 2, mode='time', max_steps=3),
+                                 [model.run(Multiset(['a']), mode='time', max_steps=3)] * 2)
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks.generators import chain
+from simulator import profiler
+from simulator.profiler import Profiler
+from utils import Multiset
+
+
+class TestProfiler(unittest.TestCase):
+    def test_report(self):
+        """
+        Test the phases, steps and neuron measures of a profiled run
+        """
+        with Profiler() as prof:
+            with profiler.phase('build'):
+                model = chain(3)
+            self.assertEqual(model.run(Multiset(['a', 'a'])), Multiset(['a', 'a']))
+        self.assertIsNone(profiler.ACTIVE)
+
+        report = prof.report()
+        self.assertSetEqual(set(report['phases']), {'build', 'rules', 'simulation'})
+        self.assertEqual(report['steps']['count'], 4)
+        for neuron in ('0', '1', '2'):
+            self.assertEqual(report['neurons'][neuron]['firings'], 1)
+            self.assertEqual(report['neurons'][neuron]['applications'], 2)
+            # Content with two spikes, then empty
+            self.assertEqual(report['neurons'][neuron]['matches'], 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'profile.json')
+            prof.dump(path)
+            with open(path) as f:
+                self.assertEqual(json.load(f)['steps']['count'], 4)
+
+    def test_disabled(self):
+        """
+        Test that instrumentation is removed after the run, and never installed without profiler
+        """
+        model = chain(3)
+        with Profiler():
+            model.run(Multiset(['a']))
+        self.assertNotIn('_run_neuron', model.__dict__)
+        self.assertNotIn('applicable', model._rules[0][0].__dict__)
+
+        calls = []
+        with profiler.phase('build'):
+            calls.append(model.run(Multiset(['a'])))
+        self.assertListEqual(calls, [Multiset(['a'])])
@@ -0,0 +1,51 @@
+import unittest
+
+from simulator.rendering import RenderPipeline
+from simulator.snpsystem import SNPSystem
+from utils import Multiset
+
+
+class _Graph:
+    def __init__(self, rendered: list, name: str, contents: dict, fail: bool) -> None:
+        self.rendered, self.name, self.contents, self.fail = rendered, name, contents, fail
+
+    def render(self, path: str) -> None:
+        if self.fail:
+            raise RuntimeError('graphviz is not installed')
+        self.rendered.append((self.name, self.contents))
+
+
+class TestRendering(unittest.TestCase):
+    @staticmethod
+    def _model(rendered: list, fail: bool = False) -> SNPSystem:
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        model.add_channel(0, 0, 'out')
+        model.add_rule(0, ['a', '+'], Multiset(['a']), {0: Multiset(['b'])})
+        model.graph = lambda contents, name: _Graph(rendered, name, contents, fail)
+        return model
+
+    def test_selected_steps(self):
+        """
+        Test that only the selected steps are rendered, each with the contents it had when it was submitted
+        """
+        rendered = []
+        model = self._model(rendered)
+        with RenderPipeline(model, '.', every=2, steps=(1, 7), workers=2, max_pending=1) as renderer:
+            state = {0: Multiset(), 'out': Multiset()}
+            for step in range(10):
+                renderer.submit(step, state)
+                state[0].add('a')
+        self.assertListEqual(sorted((name, contents[0]) for name, contents in rendered),
+                             [(f'SNP-System.{i}', Multiset(['a'] * i)) for i in (2, 4, 6)])
+
+        rendered.clear()
+        model.run(Multiset(['a']), render_steps=True)
+        self.assertListEqual(sorted(name for name, _ in rendered), ['SNP-System.0', 'SNP-System.1'])
+
+    def test_errors(self):
+        """
+        Test that an error raised while rendering a step stops the run
+        """
+        self.assertRaises(RuntimeError, self._model([], fail=True).run, Multiset(['a']), render_steps=True)
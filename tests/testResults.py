@@ -0,0 +1,53 @@
+import tempfile
+import unittest
+
+from simulator.results import ResultCache
+from simulator.snpsystem import SNPSystem
+from tests.models import coin
+from utils import Multiset
+
+
+class TestResults(unittest.TestCase):
+    def test_cached_runs(self):
+        """
+        Test that a repeated run returns the stored result without simulating, and which runs are cached
+        """
+        model = coin(regex=['a', '+'])
+        steps = []
+        step = model._step
+        model._step = lambda: steps.append(1) or step()
+        with tempfile.TemporaryDirectory() as directory:
+            results = ResultCache(directory)
+            inp = Multiset.from_counts({'a': 20})
+            res = model.run(inp, mode='time', seed=4, results=results)
+            simulated = len(steps)
+            self.assertListEqual(model.run(inp, mode='time', seed=4, results=results), res)
+            self.assertEqual(len(steps), simulated)
+            self.assertEqual(results.info()['hits'], 1)
+
+            model.run(inp, mode='time', seed=5, results=results)
+            model.run(inp, mode='halt', seed=4, results=results)
+            model.run(inp, mode='time', seed=4, max_steps=1, results=results)
+            self.assertEqual(len(steps), 4 * simulated - 1)
+            self.assertIsNone(results.key(model, inp, 'time', None))
+
+            model = coin('h', ['a', '+'])
+            self.assertEqual(results.key(model, inp, 'halt', 1), results.key(model, inp, 'halt', 2))
+            self.assertNotEqual(results.key(model, inp, 'halt', 1), results.key(model, inp, 'time', 1))
+            self.assertEqual(model.run(inp, seed=1, results=results), Multiset.from_counts({'h': 20}))
+            self.assertEqual(model.run(inp, results=results), Multiset.from_counts({'h': 20}))
+            self.assertEqual(results.info()['hits'], 2)
+
+    def test_digest(self):
+        """
+        Test that equal models have the same digest whatever the order their spikes were added in
+        """
+        digests = set()
+        for spikes in (['a', 'b'], ['b', 'a']):
+            model = SNPSystem()
+            model.add_symbols(0, *spikes)
+            model.add_rule(0, None, Multiset(spikes), {0: Multiset(spikes), 1: Multiset()})
+            digests.add(model.digest())
+        self.assertEqual(len(digests), 1)
+        model.add_rule(0, None, Multiset(['a']), {})
+        self.assertNotIn(model.digest(), digests)
@@ -0,0 +1,210 @@
+import unittest
+
+from benchmarks.generators import chain
+from simulator.history import CallbackHistory, ChannelTotals, History, StepSeries
+from simulator.snpsystem import SNPSystem, Periodic
+from utils import Multiset
+
+
+class TestSNPSystem(unittest.TestCase):
+    def test_initial_configuration(self):
+        """
+        Test that running the model does not modify its initial configuration
+        """
+        model = chain(3)
+        model.add_symbols(1, 'a', 'a')
+        self.assertEqual(model.run(Multiset(['a'] * 3)), Multiset(['a'] * 5))
+        self.assertEqual(model._ms[0], Multiset())
+        self.assertEqual(model._ms[1], Multiset(['a', 'a']))
+        self.assertEqual(model.run(Multiset(['a'])), Multiset(['a'] * 3))
+        self.assertListEqual(model.run(Multiset(), mode='time'),
+                             [Multiset(), Multiset(['a', 'a']), Multiset()])
+
+    def test_frozen_initial_configuration(self):
+        """
+        Test that runs share the frozen initial contents and copy a neuron only when it changes
+        """
+        model = chain(4)
+        model.add_symbols('idle', 'b')
+        model.run(Multiset(['a']), max_steps=1)
+        self.assertIs(model._state['idle'], model._initial['idle'])
+        self.assertIsNot(model._state[1], model._initial[1])
+        self.assertEqual(model._initial[1], Multiset())
+        self.assertRaises(TypeError, model._initial['idle'].add, 'b')
+
+        self.assertEqual(model.run(Multiset(['a'])), Multiset(['a']))
+        model.add_symbols(2, 'a')
+        self.assertEqual(model.run(Multiset(['a'])), Multiset(['a', 'a']))
+        self.assertEqual(model._ms['idle'], Multiset(['b']))
+
+    def test_active_neurons(self):
+        """
+        Test that only the neurons that received spikes or are waiting for a delayed rule are examined
+        """
+        model = chain(5)
+        model.add_rule(5, None, Multiset(['b']), {}, 1)
+        model.add_symbols(5, 'b')
+        examined = []
+        run_neuron = model._run_neuron
+        model._run_neuron = lambda neuron: examined.append(neuron) or run_neuron(neuron)
+
+        res = model.run(Multiset(['a']), mode='time')
+        self.assertListEqual(res, [Multiset()] * 4 + [Multiset(['a']), Multiset()])
+        self.assertListEqual(examined, [0, 'out', 1, 2, 3, 4, 5, 1, 5, 2, 3, 4, 'out'])
+
+    def test_timer_wheel(self):
+        """
+        Test that a blocked neuron is not examined until its rule is due and that the run waits for it
+        """
+        model = SNPSystem()
+        model.set_output('out')
+        model.add_channel(0, 'n', 'out')
+        model.add_rule('n', None, Multiset(['b']), {0: Multiset(['a'])}, 1)
+        model.add_symbols('n', 'b')
+        model._start(Multiset(), history=StepSeries(merge_channels=True))
+        model._active.clear()
+        model._block('n', model._rules['n'][0], 3)
+        checkpoint = model.checkpoint(0, 'time')
+        self.assertEqual(checkpoint.delay, {'n': (3, 0)})
+
+        examined = []
+        run_neuron = model._run_neuron
+        model._run_neuron = lambda neuron: examined.append(neuron) or run_neuron(neuron)
+        res = model.run(Multiset(), mode='time', resume=checkpoint)
+        self.assertListEqual(res, [Multiset()] * 3 + [Multiset(['a']), Multiset()])
+        self.assertListEqual(examined, ['n', 'out'])
+
+    def test_determinism(self):
+        """
+        Test that neurons whose rules can not be applicable at once are proved deterministic
+        """
+        model = chain(3)
+        model.add_rule(1, None, Multiset(['b']), {0: Multiset(['a'])})
+        model.add_rule(1, ['b', 'b', '+'], Multiset(['b']), {})
+        model.add_rule(2, ['a', 'a', '+'], Multiset(['a', 'a']), {0: Multiset(['a'])})
+        self.assertFalse(model.deterministic())
+        self.assertSetEqual(model._ambiguous, {2})
+
+        model._rules[2].pop()
+        model.finalize()
+        self.assertTrue(model.deterministic())
+        self.assertEqual(model.run(Multiset(['a', 'a'])), Multiset(['a', 'a']))
+
+    def test_rule_cache(self):
+        """
+        Test that repeated neuron contents reuse the cached applicable rules
+        """
+        model = chain(3)
+        model.run(Multiset(['a']))
+        info = model.cache_info()
+        model.run(Multiset(['a']))
+        self.assertEqual(model.cache_info()['misses'], info['misses'])
+        self.assertEqual(model.cache_info()['hits'], 2 * info['hits'] + info['misses'])
+        self.assertEqual(model.cache_info()['size'], info['size'])
+
+        model = SNPSystem(rule_cache_size=2)
+        model.add_rule(0, None, Multiset(['a']), {0: Multiset(['a'])})
+        model.run(Multiset())
+        self.assertLessEqual(model.cache_info()['size'], 2)
+
+    def test_maximal_application(self):
+        """
+        Test that a rule is applied as many times as its regex and the neuron content allow in a single step
+        """
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        model.add_channel(0, 0, 'out')
+        model.add_rule(0, ['1', '*', 'a'], Multiset(['1', '1']), {0: Multiset(['b'])})
+        res = model.run(Multiset.from_counts({'1': 100001, 'a': 1}), mode='time')
+        self.assertListEqual(res, [Multiset.from_counts({'b': 50000}), Multiset()])
+
+        model.add_rule(0, ['a', 'a', '+'], Multiset(['a']), {0: Multiset(['c'])})
+        self.assertEqual(model.run(Multiset.from_counts({'a': 7})), Multiset.from_counts({'c': 6}))
+
+    def test_cycle_detection(self):
+        """
+        Test that a run stops when a configuration repeats, unless a random choice happened in between
+        """
+        model = chain(3)
+        model.add_channel(0, 2, 0)
+        model.add_symbols(1, 'a')
+        res = model.run(Multiset(['a']), mode='time', detect_cycles=True)
+        self.assertIsInstance(res, Periodic)
+        self.assertEqual((res.start, res.period), (0, 3))
+        self.assertEqual(str(res), 'periodic, period 3 starting at step 0')
+        self.assertListEqual(res.output, [Multiset(), Multiset(['a']), Multiset(['a'])])
+
+        # Configurations with equal hashes are only a cycle if they are equal
+        fingerprint = model._fingerprint
+        model._fingerprint = lambda *args: fingerprint(*args) and 0
+        res = model.run(Multiset(['a']), mode='time', detect_cycles=True)
+        self.assertEqual((res.start, res.period), (0, 3))
+        del model._fingerprint
+
+        model.add_rule(1, ['a', '+'], Multiset(['a']), {0: Multiset(['a'])})
+        res = model.run(Multiset(['a']), mode='time', max_steps=50, detect_cycles=True)
+        self.assertNotIsInstance(res, Periodic)
+        self.assertEqual(len(res), 50)
+
+    def test_fast_forward(self):
+        """
+        Test that a loop emptying a register jumps over its periods and gives the result of the plain run
+        """
+        model = SNPSystem()
+        model.set_input(0)
+        model.set_output('out')
+        model.add_channel(0, 0, 1)
+        model.add_channel(0, 1, 0)
+        model.add_channel(1, 0, 'out')
+        model.add_channel(1, 1, 'out')
+        model.add_rule(0, ['a', '1', '+'], Multiset(['a', '1']), {0: Multiset(['a'])})
+        model.add_rule(0, None, Multiset(['a']), {1: Multiset(['h'])})
+        model.add_rule(1, None, Multiset(['a']), {0: Multiset(['a']), 1: Multiset(['t'])})
+
+        input_data = Multiset.from_counts({'a': 1, '1': 20})
+        for mode in ['halt', 'halt-mc', 'time', 'time-mc']:
+            self.assertEqual(model.run(input_data, mode=mode, fast_forward=True), model.run(input_data, mode=mode))
+        self.assertEqual(model.run(input_data, mode='time', max_steps=25, fast_forward=True),
+                         model.run(input_data, mode='time', max_steps=25))
+        emissions = []
+        model.run(input_data, history=CallbackHistory(lambda *args: emissions.append(args)), fast_forward=True)
+        self.assertListEqual(emissions, [(2 * i, 1, Multiset(['t'])) for i in range(1, 21)] + [(41, 1, Multiset(['h']))])
+
+        steps = []
+        step = model._step
+        model._step = lambda: steps.append(1) or step()
+        res = model.run(Multiset.from_counts({'a': 1, '1': 10 ** 7}), mode='halt-mc', fast_forward=True)
+        self.assertEqual(res, {1: Multiset.from_counts({'t': 10 ** 7, 'h': 1})})
+        self.assertLess(len(steps), 20)
+
+    def test_history(self):
+        """
+        Test that each mode only keeps the output it needs and that a callback receives every emission
+        """
+        model = chain(3)
+        model.run(Multiset(['a', 'a']))
+        self.assertIs(type(model._history), History)
+        model.run(Multiset(['a', 'a']), mode='halt-mc')
+        self.assertIsInstance(model._history, ChannelTotals)
+
+        emissions = []
+        res = model.run(Multiset(['a', 'a']), history=CallbackHistory(lambda *args: emissions.append(args)))
+        self.assertEqual(res, Multiset(['a', 'a']))
+        self.assertListEqual(emissions, [(3, 0, Multiset(['a', 'a']))])
+
+    def test_emission_plans(self):
+        """
+        Test that the synapses of each rule are resolved once and resolved again when the model changes
+        """
+        model = chain(2)
+        model.add_channel(0, 0, 'out')
+        model.add_channel(1, 0, 1)
+        model._rules[0][0].channels[1] = Multiset(['b'])
+        self.assertEqual(model.run(Multiset(['a']), mode='halt-mc'), {0: Multiset(['a'])})
+        self.assertListEqual(sorted(map(str, model._rules[0][0].targets)),
+                             sorted(map(str, [(1, Multiset(['a', 'b'])), ('out', Multiset(['a']))])))
+        self.assertListEqual([channel for channel, _ in model._rules[0][0].outputs], [0])
+
+        model.add_channel(1, 0, 'out')
+        self.assertEqual(model.run(Multiset(['a']), mode='halt-mc'), {0: Multiset(['a']), 1: Multiset(['b'])})
@@ -0,0 +1,49 @@
+import unittest
+
+from simulator.snpsystem import Periodic
+from simulator.statistics import OutcomeHistogram, aggregate_repeated, wilson_interval
+from tests.models import coin
+from utils import Multiset
+
+
+class TestStatistics(unittest.TestCase):
+    def test_histogram(self):
+        """
+        Test that equal results are counted together whatever the mode, and that partial histograms merge
+        """
+        a = OutcomeHistogram([Multiset(['a', 'b']), Multiset(['b', 'a']), Multiset()])
+        b = OutcomeHistogram([{0: Multiset(['a']), 1: Multiset()}, {0: Multiset(['a'])}, Multiset(['a', 'b'])])
+        b.add([Multiset(['a']), Multiset()], 3)
+        b.add(Periodic(0, 2, [Multiset()]))
+        a += b
+        self.assertEqual((a.total, len(a)), (10, 5))
+        self.assertEqual(a.count(Multiset(['a', 'b'])), 3)
+        self.assertEqual(a.count({0: Multiset(['a'])}), 2)
+        self.assertEqual(a.count([Multiset(['a']), Multiset()]), 3)
+        self.assertEqual(a.count(Periodic(0, 2, [Multiset()])), 1)
+        self.assertAlmostEqual(a.frequency(Multiset()), 0.1)
+        self.assertListEqual([count for _, count, _, _ in a.outcomes()], [3, 3, 2, 1, 1])
+        self.assertEqual(str(a), 'runs: 10, outcomes: 5')
+
+    def test_wilson_interval(self):
+        """
+        Test the Wilson interval against known values and its bounds
+        """
+        low, high = wilson_interval(50, 100)
+        self.assertAlmostEqual(low, 0.4038, places=4)
+        self.assertAlmostEqual(high, 0.5962, places=4)
+        self.assertEqual(wilson_interval(0, 10)[0], 0)
+        self.assertEqual(wilson_interval(10, 10)[1], 1)
+        self.assertEqual(wilson_interval(0, 0), (0.0, 1.0))
+
+    def test_aggregate_repeated(self):
+        """
+        Test that the histogram of a batch of runs does not depend on the number of jobs
+        """
+        model = coin()
+        serial = aggregate_repeated(model, Multiset(['a']), 200, seed=5)
+        self.assertEqual(serial.total, 200)
+        self.assertEqual(len(serial), 2)
+        self.assertEqual(aggregate_repeated(model, Multiset(['a']), 200, jobs=2, seed=5).counts, serial.counts)
+
+        self.assertEqual(aggregate_repeated(coin('h'), Multiset(['a']), 1000).counts, {(('h', 1),): 1000})
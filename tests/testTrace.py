@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from simulator.trace import Event, RECORD, TraceReader, TraceWriter
+from tests.models import choice_ring
+from utils import Multiset
+
+
+class TestTrace(unittest.TestCase):
+    def test_replay(self):
+        """
+        Test that the configurations rebuilt from the trace are those of the run, from any keyframe
+        """
+        model = choice_ring()
+        configurations = []
+        update_state = model._update_state
+
+        def recorded_update_state():
+            update_state()
+            configurations.append(({n: Multiset.from_counts(c.map) for n, c in model._state.items()},
+                                   {n: (d, model._rules[n].index(r)) for n, (d, r) in model._delays().items()}))
+
+        model._update_state = recorded_update_state
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.trace')
+            with TraceWriter(path, keyframe_every=4, buffer_size=RECORD.size * 3) as trace:
+                res = model.run(Multiset(['a', 'a']), mode='time', max_steps=30, seed=3, trace=trace)
+            del model._update_state
+            self.assertListEqual(model.run(Multiset(['a', 'a']), mode='time', max_steps=30, seed=3), res)
+
+            with TraceReader(path) as reader:
+                self.assertEqual(reader.model, model.digest())
+                self.assertEqual(reader.steps, 30)
+                self.assertEqual(reader.configuration(0).contents[0], Multiset(['a', 'a']))
+                replayed = list(reader.replay(1))
+                # The run merges the spikes once more after its last step
+                self.assertListEqual([(c.contents, c.delays) for c in replayed], configurations[:30])
+                for step in (1, 9, 13, 30):
+                    self.assertEqual(reader.configuration(step), replayed[step - 1])
+                self.assertRaises(ValueError, reader.configuration, 31)
+
+                events = list(reader.events_between(5, 6))
+                self.assertTrue(events)
+                self.assertTrue(all(e.step in (5, 6) for e in events))
+                self.assertEqual(sum(1 for _ in reader.events_between()), len(reader))
+                self.assertIn(Event(1, 0, 0, 2), list(reader.events_between(1, 1)))
+                self.assertEqual(reader.rule(Event(1, 2, 0, 1)).channels, {0: {'a': 1}, 1: {'b': 1}})
+
+    def test_single_run(self):
+        """
+        Test that a trace can not record two runs nor a fast-forwarded one
+        """
+        model = choice_ring()
+        with tempfile.TemporaryDirectory() as directory:
+            with TraceWriter(os.path.join(directory, 'run.trace')) as trace:
+                self.assertRaises(ValueError, model.run, Multiset(['a']), fast_forward=True, trace=trace)
+                model.run(Multiset(['a']), max_steps=5, trace=trace)
+                self.assertRaises(ValueError, model.run, Multiset(['a']), max_steps=5, trace=trace)
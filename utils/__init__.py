@@ -1,4 +1,6 @@
 from .identityset import IdentitySet, IdentityFrozenSet
 from .identitydict import IdentityDefaultdict
 from .functions import closing_index
-from .multiset import Multiset
+from .multiset import FrozenMultiset, Multiset
+from .lrucache import LRUCache
+from .diskcache import DiskCache
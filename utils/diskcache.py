@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import Any, List, Optional
+
+
+class DiskCache:
+    """
+    Pickled values stored in a directory, one file per key. With max_bytes, the least recently used entries are
+    removed whenever the entries take more than max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None) -> None:
+        self.path: str = path
+        self.max_bytes: Optional[int] = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        # Size of the entries, measured on the first store and then kept up to date by this process
+        self._size: Optional[int] = None
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            # The length keeps ('ab', 'c') and ('a', 'bc') apart
+            h.update(f'{len(part)}:'.encode())
+            h.update(part.encode())
+        return h.hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f'{key}.pickle')
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._file(key))
+
+    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        try:
+            with open(self._file(key), 'rb') as f:
+                res = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Written by an incompatible version of the code, it is replaced on the next store
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.max_bytes is not None:
+            try:
+                # The modification time orders the entries by their last use
+                os.utime(self._file(key))
+            except FileNotFoundError:
+                pass
+        return res
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # Written aside and then renamed, so concurrent readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp)
+            try:
+                # An overwritten entry no longer counts
+                size -= os.path.getsize(self._file(key))
+            except FileNotFoundError:
+                pass
+            os.replace(tmp, self._file(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if self.max_bytes is not None:
+            self._size = self._entries_size() if self._size is None else self._size + size
+            if self._size > self.max_bytes:
+                self.evict(self.max_bytes)
+
+    def _entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.path) if entry.name.endswith('.pickle')]
+
+    def _entries_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def evict(self, max_bytes: int) -> None:
+        """
+        Removes the least recently used entries until the rest take at most max_bytes
+        """
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        entries.sort()
+        size = sum(s for _, s, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                # Removed by another process sharing the directory
+                pass
+            size -= entry_size
+        self._size = size
+
+    def __delitem__(self, key: str) -> None:
+        os.remove(self._file(key))
+        self._size = None
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            os.remove(entry.path)
+        self._size = 0
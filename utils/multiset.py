@@ -2,16 +2,27 @@ from __future__ import annotations
 
 from collections import defaultdict
 from collections.abc import MutableSet
-from typing import Dict, Iterator, Iterable, TypeVar, Set
+from copy import copy
+from typing import Dict, FrozenSet, Iterator, Iterable, Mapping, Tuple, TypeVar, Set
 
 T = TypeVar('T')
 
 
 class Multiset(MutableSet[T]):
+    frozen: bool = False
+
     def __init__(self, iterable: Iterable[T] = ()) -> None:
         self.map: Dict[T, int] = defaultdict(int)
         self.extend(iterable)
 
+    @classmethod
+    def from_counts(cls, counts: Mapping[T, int]) -> Multiset[T]:
+        res = cls()
+        for item, count in counts.items():
+            if count > 0:
+                res.map[item] += count
+        return res
+
     def __eq__(self, other):
         if set(self.map.keys()) != set(other.map.keys()):
             return False
@@ -38,25 +49,40 @@ class Multiset(MutableSet[T]):
         return x in self.map.keys()
 
     def __copy__(self):
-        result = type(self)(self)
+        result = type(self)()
+        result.map.update(self.map)
         return result
 
     def __sub__(self, other: Iterable[T]) -> Multiset[T]:
-        res = type(self)(self)
-        for item in other:
-            res.discard(item)
+        res = copy(self)
+        res -= other
         return res
 
+    def __isub__(self, other: Iterable[T]) -> Multiset[T]:
+        if other is self:
+            self.map.clear()
+        elif isinstance(other, Multiset):
+            for item, count in other.map.items():
+                if count > 0 and item in self.map:
+                    self.map[item] -= count
+                    if self.map[item] <= 0:
+                        del self.map[item]
+        else:
+            for item in other:
+                self.discard(item)
+        return self
+
     def __add__(self, other: Iterable[T]) -> Multiset[T]:
-        res = type(self)(self)
-        for item in other:
-            res.add(item)
+        res = copy(self)
+        res.extend(other)
         return res
 
     def __mul__(self, other: int) -> Multiset[T]:
         res = Multiset()
-        for _ in range(other):
-            res.extend(self)
+        if other > 0:
+            for item, count in self.map.items():
+                if count > 0:
+                    res.map[item] = count * other
         return res
 
     def dot(self) -> str:
@@ -84,14 +110,22 @@ class Multiset(MutableSet[T]):
             del self.map[value]
 
     def extend(self, other: Iterable[T]) -> None:
+        if isinstance(other, Multiset):
+            for item, count in other.map.items():
+                if count > 0:
+                    self.map[item] += count
+            return
         for item in other:
             self._add(item)
 
     def union(self, other: Iterable[T]) -> Multiset[T]:
         res = type(self)(self)
-        c = defaultdict(int)
-        for item in other:
-            c[item] += 1
+        if isinstance(other, Multiset):
+            c = other.map
+        else:
+            c = defaultdict(int)
+            for item in other:
+                c[item] += 1
         for item, value in c.items():
             res.map[item] = max(res.map[item], value)
         return res
@@ -105,7 +139,38 @@ class Multiset(MutableSet[T]):
     def set(self) -> Set[T]:
         return set(self.map.keys())
 
+    def signature(self) -> FrozenSet[Tuple[T, int]]:
+        return frozenset((k, v) for k, v in self.map.items() if v > 0)
+
     def count(self, symbol: T) -> int:
         if symbol not in self.map:
             return 0
         return self.map[symbol]
+
+
+class FrozenMultiset(Multiset[T]):
+    """
+    Multiset shared by several owners: the in place subtraction returns a new Multiset and the other modifications fail
+    """
+    frozen: bool = True
+
+    def __init__(self, iterable: Iterable[T] = ()) -> None:
+        self.map: Dict[T, int] = defaultdict(int)
+        Multiset.extend(self, iterable)
+
+    def __copy__(self) -> Multiset[T]:
+        result = Multiset()
+        result.map.update(self.map)
+        return result
+
+    def __isub__(self, other: Iterable[T]) -> Multiset[T]:
+        return self - other
+
+    def _add(self, value: T) -> None:
+        raise TypeError('A frozen multiset can not be modified')
+
+    def discard(self, value: T) -> None:
+        raise TypeError('A frozen multiset can not be modified')
+
+    def extend(self, other: Iterable[T]) -> None:
+        raise TypeError('A frozen multiset can not be modified')